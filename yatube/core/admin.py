@@ -1 +1,51 @@
-# Register your models here.
+from django.contrib import admin, messages
+
+from .models import OutboxMessage
+
+
+class QueuedDeletionMixin:
+    """Не удаляет объекты сразу, а ставит их в очередь команды
+    process_deletions.
+
+    Постановку в очередь задаёт атрибут `enqueue` модели админки.
+    """
+
+    enqueue = None
+
+    def get_deleted_objects(self, objs, request):
+        # Стандартная страница подтверждения собирает в памяти все
+        # связанные объекты — ровно то, чего очередь позволяет избежать.
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        objs = list(objs)
+        return (
+            [str(obj) for obj in objs],
+            {self.opts.verbose_name_plural: len(objs)},
+            perms_needed,
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        self.enqueue(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.enqueue(obj)
+
+    def response_delete(self, request, obj_display, obj_id):
+        messages.info(
+            request, 'Объект будет удалён командой process_deletions.'
+        )
+        return super().response_delete(request, obj_display, obj_id)
+
+
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'subject', 'created', 'attempts', 'next_attempt',)
+    search_fields = ('subject',)
+    list_filter = ('created',)
+    exclude = ('message',)
+    readonly_fields = ('subject', 'attempts', 'last_error',)
+
+
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
@@ -0,0 +1,424 @@
+"""Двухуровневый кеш: LRU в памяти процесса и общий SQLite-файл.
+
+L1 — ограниченный LRU в памяти процесса, отвечает без ввода-вывода.
+L2 — SQLite-файл, общий для всех процессов на машине. Каждая запись
+в L2 добавляет строку в журнал инвалидаций с растущим номером (версией).
+Процесс не реже раза в SYNC_INTERVAL секунд читает из журнала новые
+версии и выбрасывает из L1 устаревшие ключи, поэтому изменения из
+другого процесса видны не позже чем через SYNC_INTERVAL.
+
+Счётчики попаданий по уровням доступны через stats() и периодически
+сохраняются в L2, откуда их читает команда cache_stats.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Номер в журнале, означающий очистку всего кеша.
+CLEAR_ALL = '*'
+# Сколько ключей get_many читает из L2 одним запросом.
+GET_MANY_CHUNK = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entries ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE TABLE IF NOT EXISTS cache_invalidations ('
+    'stamp INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS cache_stats ('
+    'pid INTEGER PRIMARY KEY, l1_hits INTEGER, l2_hits INTEGER, '
+    'misses INTEGER, updated REAL)',
+)
+
+
+class TwoLevelCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self.sync_interval = float(options.get('SYNC_INTERVAL', 0.2))
+        # Сколько последних инвалидаций хранить в журнале.
+        self.journal_size = int(options.get('JOURNAL_SIZE', 10000))
+        self.stats_interval = float(options.get('STATS_INTERVAL', 10))
+        self._l1 = OrderedDict()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._pid = None
+        self._reset_process_state()
+
+    def _reset_process_state(self):
+        self._pid = os.getpid()
+        self._l1.clear()
+        self._last_stamp = None
+        self._last_sync = 0.0
+        self._last_stats = time.time()
+        self._writes = 0
+        self._counters = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0}
+
+    # L2
+
+    @property
+    def _db(self):
+        if self._pid != os.getpid():
+            # После fork память L1 и соединения родителя не годятся.
+            with self._lock:
+                self._reset_process_state()
+            self._local = threading.local()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.location, timeout=10, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            if self._last_stamp is None:
+                # L1 пока пуст: всё, что было в журнале, уже неважно.
+                self._last_stamp = connection.execute(
+                    'SELECT COALESCE(MAX(stamp), 0) FROM cache_invalidations'
+                ).fetchone()[0]
+        return connection
+
+    def _invalidate(self, db, key):
+        """Пишет ключ в журнал и возвращает номер записи."""
+        return db.execute(
+            'INSERT INTO cache_invalidations (key) VALUES (?)', (key,)
+        ).lastrowid
+
+    def _write(self, statements, key):
+        """Выполняет запись в L2 одной транзакцией вместе с журналом."""
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            result = statements(db)
+            stamp = self._invalidate(db, key)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._cull()
+        return result, stamp
+
+    def _cull(self):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute(
+                'DELETE FROM cache_entries WHERE expires IS NOT NULL '
+                'AND expires <= ?', (time.time(),)
+            )
+            count = db.execute(
+                'SELECT COUNT(*) FROM cache_entries'
+            ).fetchone()[0]
+            if count > self._max_entries:
+                culled = db.execute(
+                    'SELECT key FROM cache_entries ORDER BY rowid LIMIT ?',
+                    (count // self._cull_frequency,)
+                ).fetchall()
+                db.executemany(
+                    'DELETE FROM cache_entries WHERE key = ?', culled
+                )
+                # Вытесненные живые ключи должны пропасть и из чужих L1.
+                db.executemany(
+                    'INSERT INTO cache_invalidations (key) VALUES (?)', culled
+                )
+            db.execute(
+                'DELETE FROM cache_invalidations WHERE stamp <= '
+                '(SELECT MAX(stamp) FROM cache_invalidations) - ?',
+                (self.journal_size,)
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    # L1
+
+    def _sync(self):
+        """Выбрасывает из L1 ключи, изменённые другими процессами."""
+        db = self._db
+        now = time.time()
+        if now - self._last_sync < self.sync_interval:
+            return
+        first_stamp = db.execute(
+            'SELECT COALESCE(MIN(stamp), 0) FROM cache_invalidations'
+        ).fetchone()[0]
+        rows = db.execute(
+            'SELECT stamp, key FROM cache_invalidations '
+            'WHERE stamp > ? ORDER BY stamp', (self._last_stamp,)
+        ).fetchall()
+        with self._lock:
+            if first_stamp > self._last_stamp + 1:
+                # Журнал уже обрезан: неизвестно, что поменялось.
+                self._l1.clear()
+            for stamp, key in rows:
+                if key == CLEAR_ALL:
+                    self._l1.clear()
+                    continue
+                entry = self._l1.get(key)
+                if entry is not None and entry[2] < stamp:
+                    del self._l1[key]
+            if rows:
+                self._last_stamp = rows[-1][0]
+            self._last_sync = now
+        if now - self._last_stats >= self.stats_interval:
+            self._save_stats(now)
+
+    def _l1_set(self, key, pickled, expires, stamp):
+        with self._lock:
+            self._l1[key] = (pickled, expires, stamp)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, key):
+        with self._lock:
+            self._l1.pop(key, None)
+
+    # Статистика
+
+    def _count(self, counter):
+        self._counters[counter] += 1
+
+    def stats(self):
+        """Попадания по уровням в текущем процессе."""
+        counters = dict(self._counters)
+        total = sum(counters.values())
+        counters['l1_ratio'] = counters['l1_hits'] / total if total else 0
+        counters['l2_ratio'] = counters['l2_hits'] / total if total else 0
+        return counters
+
+    def _save_stats(self, now):
+        self._last_stats = now
+        counters = self._counters
+        self._db.execute(
+            'INSERT OR REPLACE INTO cache_stats '
+            '(pid, l1_hits, l2_hits, misses, updated) VALUES (?, ?, ?, ?, ?)',
+            (self._pid, counters['l1_hits'], counters['l2_hits'],
+             counters['misses'], now)
+        )
+
+    def process_stats(self):
+        """Последние сохранённые счётчики всех процессов."""
+        self._save_stats(time.time())
+        return self._db.execute(
+            'SELECT pid, l1_hits, l2_hits, misses, updated '
+            'FROM cache_stats ORDER BY pid'
+        ).fetchall()
+
+    # API кеша Django
+
+    def _lookup(self, key):
+        """Значение ключа в сериализованном виде или None."""
+        self._sync()
+        now = time.time()
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is not None:
+                if entry[1] is None or entry[1] > now:
+                    self._l1.move_to_end(key)
+                    self._count('l1_hits')
+                    return entry[0]
+                del self._l1[key]
+            stamp = self._last_stamp
+        row = self._db.execute(
+            'SELECT value, expires FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            self._count('misses')
+            return None
+        self._count('l2_hits')
+        self._l1_set(key, row[0], row[1], stamp)
+        return row[0]
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = self._lookup(key)
+        if pickled is None:
+            return default
+        return pickle.loads(pickled)
+
+    def get_many(self, keys, version=None):
+        """Значения ключей: из L1, а промахи — одним запросом к L2."""
+        self._sync()
+        now = time.time()
+        found = {}
+        missing = {}
+        with self._lock:
+            for key in keys:
+                made_key = self.make_key(key, version=version)
+                self.validate_key(made_key)
+                entry = self._l1.get(made_key)
+                if entry is not None and (
+                    entry[1] is None or entry[1] > now
+                ):
+                    self._l1.move_to_end(made_key)
+                    self._count('l1_hits')
+                    found[key] = entry[0]
+                else:
+                    missing[made_key] = key
+            stamp = self._last_stamp
+        made_keys = list(missing)
+        # SQLite ограничивает число параметров запроса.
+        for start in range(0, len(made_keys), GET_MANY_CHUNK):
+            chunk = made_keys[start:start + GET_MANY_CHUNK]
+            rows = self._db.execute(
+                'SELECT key, value, expires FROM cache_entries '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})', chunk
+            ).fetchall()
+            for made_key, pickled, expires in rows:
+                if expires is not None and expires <= now:
+                    continue
+                self._count('l2_hits')
+                self._l1_set(made_key, pickled, expires, stamp)
+                found[missing.pop(made_key)] = pickled
+        for _ in missing:
+            self._count('misses')
+        return {key: pickle.loads(value) for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        expires = self.get_backend_timeout(timeout)
+
+        def statements(db):
+            db.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires) '
+                'VALUES (?, ?, ?)', (key, pickled, expires)
+            )
+
+        _, stamp = self._write(statements, key)
+        self._l1_set(key, pickled, expires, stamp)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        expires = self.get_backend_timeout(timeout)
+
+        def statements(db):
+            db.execute(
+                'DELETE FROM cache_entries WHERE key = ? '
+                'AND expires IS NOT NULL AND expires <= ?',
+                (key, time.time())
+            )
+            return db.execute(
+                'INSERT OR IGNORE INTO cache_entries (key, value, expires) '
+                'VALUES (?, ?, ?)', (key, pickled, expires)
+            ).rowcount == 1
+
+        added, stamp = self._write(statements, key)
+        if added:
+            self._l1_set(key, pickled, expires, stamp)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+
+        def statements(db):
+            return db.execute(
+                'UPDATE cache_entries SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (expires, key, time.time())
+            ).rowcount == 1
+
+        touched, _ = self._write(statements, key)
+        self._l1_delete(key)
+        return touched
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def statements(db):
+            db.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+        self._write(statements, key)
+        self._l1_delete(key)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._lookup(key) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def statements(db):
+            row = db.execute(
+                'SELECT value, expires FROM cache_entries WHERE key = ?',
+                (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            new_value = pickle.loads(row[0]) + delta
+            pickled = pickle.dumps(new_value, self.pickle_protocol)
+            db.execute(
+                'UPDATE cache_entries SET value = ? WHERE key = ?',
+                (pickled, key)
+            )
+            return new_value, pickled, row[1]
+
+        (new_value, pickled, expires), stamp = self._write(statements, key)
+        self._l1_set(key, pickled, expires, stamp)
+        return new_value
+
+    def update(self, key, function, timeout=DEFAULT_TIMEOUT, version=None):
+        """Атомарно заменяет значение ключа на вычисленное по нему.
+
+        function получает текущее значение (None, если ключа нет)
+        и возвращает пару: новое значение и результат для вызывающего.
+        Значение читается из L2 мимо L1 в той же транзакции, что и
+        запись, поэтому параллельные процессы не видят промежуточных
+        состояний.
+        """
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expires = self.get_backend_timeout(timeout)
+
+        def statements(db):
+            row = db.execute(
+                'SELECT value, expires FROM cache_entries WHERE key = ?',
+                (key,)
+            ).fetchone()
+            current = None
+            if row is not None and (row[1] is None or row[1] > time.time()):
+                current = pickle.loads(row[0])
+            value, result = function(current)
+            pickled = pickle.dumps(value, self.pickle_protocol)
+            db.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires) '
+                'VALUES (?, ?, ?)', (key, pickled, expires)
+            )
+            return result, pickled
+
+        (result, pickled), stamp = self._write(statements, key)
+        self._l1_set(key, pickled, expires, stamp)
+        return result
+
+    def clear(self):
+        def statements(db):
+            db.execute('DELETE FROM cache_entries')
+
+        self._write(statements, CLEAR_ALL)
+        with self._lock:
+            self._l1.clear()
+
+    def close(self, **kwargs):
+        # Соединения с SQLite живут всё время работы потока.
+        pass
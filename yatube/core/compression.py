@@ -0,0 +1,74 @@
+"""Сжатие ответов и удаление лишних пробелов из HTML.
+
+Сжатый вариант ответа, который могут получить и другие посетители
+(анонимный запрос без cookies в ответе), хранится в кеше по хешу
+исходного содержимого. Готовые страницы и страницы из кешированных
+фрагментов совпадают байт в байт, поэтому повторно не сжимаются.
+"""
+import gzip
+import hashlib
+import re
+
+from django.utils.text import compress_sequence
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Блоки, где пробелы значимы: их содержимое не трогаем.
+PROTECTED_RE = re.compile(
+    r'(<(pre|textarea|script|style)\b.*?</\2\s*>)',
+    re.IGNORECASE | re.DOTALL,
+)
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def available_encodings():
+    """Поддерживаемые кодировки в порядке предпочтения."""
+    if brotli is not None:
+        return ('br', 'gzip')
+    return ('gzip',)
+
+
+def _collapse(match):
+    return '\n' if '\n' in match.group() else ' '
+
+
+def minify_html(html):
+    """Сворачивает серии пробельных символов в один пробел или перенос
+    строки вне <pre>, <textarea>, <script> и <style>."""
+    parts = PROTECTED_RE.split(html)
+    result = []
+    # split() с двумя группами возвращает текст, блок и имя тега.
+    for index in range(0, len(parts), 3):
+        result.append(WHITESPACE_RE.sub(_collapse, parts[index]))
+        if index + 1 < len(parts):
+            result.append(parts[index + 1])
+    return ''.join(result)
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data)
+    return gzip.compress(data, 6, mtime=0)
+
+
+def _brotli_sequence(sequence):
+    compressor = brotli.Compressor()
+    for item in sequence:
+        data = compressor.process(item) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_stream(sequence, encoding):
+    if encoding == 'br':
+        return _brotli_sequence(sequence)
+    return compress_sequence(sequence)
+
+
+def content_key(content, encoding):
+    digest = hashlib.sha1(content).hexdigest()
+    return f'compressed:{encoding}:{digest}'
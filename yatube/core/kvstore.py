@@ -0,0 +1,139 @@
+"""Хранилище ключей sorl-thumbnail в локальном SQLite-файле.
+
+Перед файлом стоит ограниченный LRU-кеш в памяти процесса, поэтому
+страница с десятком миниатюр не обращается ни к БД проекта, ни к общему
+кешу. Ключи миниатюр всех постов страницы можно загрузить одним
+запросом через prefetch().
+
+Записи LRU живут THUMBNAIL_KVSTORE_LRU_TIMEOUT секунд: так изменения
+и удаления из других процессов (например, команды process_deletions)
+становятся видны без общего журнала.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+
+# Отметка в LRU: ключа нет и в файле, повторно его не ищем.
+MISSING = object()
+# Ограничение SQLite на число параметров в одном запросе.
+MAX_QUERY_PARAMS = 900
+
+
+class LRUCache:
+    """Ограниченный по числу записей и времени жизни LRU-кеш,
+    безопасный для потоков."""
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                value, expires = self.data[key]
+            except KeyError:
+                return None
+            if expires <= time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + self.timeout)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class KVStore(KVStoreBase):
+    def __init__(self):
+        super().__init__()
+        self.filename = settings.THUMBNAIL_KVSTORE_FILE
+        self.lru = LRUCache(
+            settings.THUMBNAIL_KVSTORE_LRU_SIZE,
+            settings.THUMBNAIL_KVSTORE_LRU_TIMEOUT,
+        )
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.filename, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS thumbnail_kvstore '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+            )
+            self.local.connection = connection
+        return connection
+
+    def prefetch(self, image_files):
+        """Загружает в LRU записи для всех `image_files` одним запросом."""
+        keys = [add_prefix(image_file.key) for image_file in image_files]
+        missing = [key for key in keys if self.lru.get(key) is None]
+        for start in range(0, len(missing), MAX_QUERY_PARAMS):
+            chunk = missing[start:start + MAX_QUERY_PARAMS]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = dict(self.connection.execute(
+                'SELECT key, value FROM thumbnail_kvstore '
+                f'WHERE key IN ({placeholders})',
+                chunk,
+            ))
+            for key in chunk:
+                self.lru.set(key, rows.get(key, MISSING))
+
+    def _get_raw(self, key):
+        value = self.lru.get(key)
+        if value is None:
+            row = self.connection.execute(
+                'SELECT value FROM thumbnail_kvstore WHERE key = ?', (key,)
+            ).fetchone()
+            value = row[0] if row else MISSING
+            self.lru.set(key, value)
+        if value is MISSING:
+            return None
+        return value
+
+    def _set_raw(self, key, value):
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO thumbnail_kvstore (key, value) '
+                'VALUES (?, ?)',
+                (key, value),
+            )
+        self.lru.set(key, value)
+
+    def _delete_raw(self, *keys):
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM thumbnail_kvstore WHERE key = ?',
+                [(key,) for key in keys],
+            )
+        for key in keys:
+            self.lru.delete(key)
+
+    def _find_keys_raw(self, prefix):
+        escaped = prefix.replace('\\', '\\\\')
+        escaped = escaped.replace('%', '\\%').replace('_', '\\_')
+        rows = self.connection.execute(
+            "SELECT key FROM thumbnail_kvstore WHERE key LIKE ? ESCAPE '\\'",
+            (escaped + '%',),
+        )
+        return [row[0] for row in rows]
@@ -0,0 +1,110 @@
+"""Очередь исходящих писем.
+
+OutboxEmailBackend только сохраняет письма в БД, поэтому представления
+не ждут почтовый сервер. Команда send_outbox отправляет их пачками
+через OUTBOX_EMAIL_BACKEND по одному соединению и повторяет неудачные
+отправки с растущей задержкой.
+"""
+import pickle
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        outbox = []
+        for message in email_messages:
+            # Соединение не сериализуется и воркеру не нужно.
+            connection, message.connection = message.connection, None
+            try:
+                outbox.append(OutboxMessage(
+                    message=pickle.dumps(message),
+                    subject=str(message.subject)[:255],
+                ))
+            finally:
+                message.connection = connection
+        OutboxMessage.objects.bulk_create(outbox)
+        return len(outbox)
+
+
+def retry_delay(attempts):
+    """Задержка перед следующей попыткой: удваивается с каждой ошибкой."""
+    return timedelta(
+        seconds=settings.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    )
+
+
+def claim_batch(batch_size):
+    """Забирает пачку писем, которые пора отправить.
+
+    Письма берутся в аренду: их следующая попытка откладывается на
+    OUTBOX_LEASE. UPDATE повторно проверяет, что письмо ещё не в
+    аренде, поэтому письмо, выбранное двумя воркерами, достаётся только
+    одному. Воркер получает те письма, чья аренда совпадает с его.
+    """
+    now = timezone.now()
+    # Случайные микросекунды отличают аренду от аренды параллельного
+    # воркера, начатой в тот же момент.
+    lease = now + timedelta(
+        seconds=settings.OUTBOX_LEASE,
+        microseconds=secrets.randbelow(10 ** 6),
+    )
+    ids = list(OutboxMessage.objects.filter(
+        next_attempt__lte=now,
+        attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+    ).values_list('id', flat=True)[:batch_size])
+    OutboxMessage.objects.filter(id__in=ids, next_attempt__lte=now).update(
+        next_attempt=lease
+    )
+    return list(OutboxMessage.objects.filter(
+        id__in=ids, next_attempt=lease
+    ).order_by('id'))
+
+
+def record_failure(outbox_message, error):
+    outbox_message.attempts += 1
+    outbox_message.last_error = repr(error)
+    outbox_message.next_attempt = (
+        timezone.now() + retry_delay(outbox_message.attempts)
+    )
+    outbox_message.save(
+        update_fields=('attempts', 'last_error', 'next_attempt')
+    )
+
+
+def send_batch(batch_size=None):
+    """Отправляет одну пачку писем. Возвращает (отправлено, ошибок)."""
+    batch = claim_batch(batch_size or settings.OUTBOX_BATCH_SIZE)
+    if not batch:
+        return 0, 0
+    sent = []
+    failed = 0
+    connection = get_connection(settings.OUTBOX_EMAIL_BACKEND)
+    try:
+        connection.open()
+    except Exception as error:
+        for outbox_message in batch:
+            record_failure(outbox_message, error)
+        return 0, len(batch)
+    try:
+        for outbox_message in batch:
+            try:
+                message = pickle.loads(outbox_message.message)
+                message.connection = connection
+                connection.send_messages([message])
+            except Exception as error:
+                record_failure(outbox_message, error)
+                failed += 1
+            else:
+                sent.append(outbox_message.pk)
+    finally:
+        connection.close()
+        OutboxMessage.objects.filter(pk__in=sent).delete()
+    return len(sent), failed
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+
+def ratio(part, total):
+    return f'{100 * part / total:.1f}%' if total else '-'
+
+
+class Command(BaseCommand):
+    help = 'Показывает долю попаданий в L1 и L2 по процессам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default', help='Имя кеша.')
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not hasattr(cache, 'process_stats'):
+            raise CommandError('Кеш не двухуровневый.')
+        totals = [0, 0, 0]
+        for pid, l1_hits, l2_hits, misses, updated in cache.process_stats():
+            total = l1_hits + l2_hits + misses
+            self.stdout.write(
+                f'pid {pid}: L1 {ratio(l1_hits, total)}, '
+                f'L2 {ratio(l2_hits, total)}, промахи {ratio(misses, total)}'
+                f' из {total} (на {datetime.fromtimestamp(updated):%X})'
+            )
+            totals = [
+                value + delta
+                for value, delta in zip(totals, (l1_hits, l2_hits, misses))
+            ]
+        total = sum(totals)
+        self.stdout.write(
+            f'Всего: L1 {ratio(totals[0], total)}, '
+            f'L2 {ratio(totals[1], total)}, промахи {ratio(totals[2], total)}'
+        )
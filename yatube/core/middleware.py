@@ -0,0 +1,171 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+from . import compression
+from .serving import serve_file
+
+# Сначала предлагаем brotli, затем gzip.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding, кроме явно запрещённых q=0."""
+    accepted = set()
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        if re.match(r'\s*q\s*=\s*0(\.0*)?\s*$', params):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную статику из STATIC_ROOT без внешнего веб-сервера.
+
+    Если клиент принимает сжатие, отдаётся заранее сжатый вариант.
+    Файлы с хешем в имени кешируются браузером навсегда.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.root = settings.STATIC_ROOT
+        self._hashed_names = None
+
+    def __call__(self, request):
+        if (
+            self.root
+            and request.method in ('GET', 'HEAD')
+            and request.path.startswith(self.prefix)
+        ):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    @property
+    def hashed_names(self):
+        if self._hashed_names is None:
+            hashed_files = getattr(
+                staticfiles_storage, 'load_manifest', dict
+            )()
+            self._hashed_names = set(hashed_files.values())
+        return self._hashed_names
+
+    def serve(self, request, name):
+        try:
+            fullpath = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(fullpath):
+            return None
+        content_type, _ = mimetypes.guess_type(fullpath)
+        immutable = name in self.hashed_names
+        accepted = accepted_encodings(request)
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted and os.path.isfile(fullpath + suffix):
+                response = serve_file(
+                    request, fullpath + suffix, content_type=content_type,
+                    encoding=encoding, immutable=immutable,
+                )
+                break
+        else:
+            response = serve_file(
+                request, fullpath, content_type=content_type,
+                immutable=immutable,
+            )
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class CompressionMiddleware:
+    """Удаляет лишние пробелы из HTML и сжимает ответы gzip или brotli,
+    в том числе потоковые.
+
+    Сжатое содержимое ответов, одинаковых для всех посетителей, берётся
+    из кеша по хешу исходного содержимого.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.choose_encoding(request)
+        if response.streaming:
+            if encoding is None:
+                return response
+            response.streaming_content = compression.compress_stream(
+                response.streaming_content, encoding
+            )
+            del response['Content-Length']
+        else:
+            response.content = self.encode(request, response, encoding)
+            response['Content-Length'] = str(len(response.content))
+        if encoding is not None:
+            etag = response.get('ETag')
+            if etag and etag.startswith('"'):
+                response['ETag'] = 'W/' + etag
+            response['Content-Encoding'] = encoding
+        return response
+
+    def compressible(self, response):
+        if response.has_header('Content-Encoding'):
+            return False
+        if response.status_code == 206 or response.has_header(
+            'Content-Range'
+        ):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if not content_type.startswith(settings.COMPRESSION_TYPES):
+            return False
+        return response.streaming or (
+            len(response.content) >= settings.COMPRESSION_MIN_LENGTH
+        )
+
+    def choose_encoding(self, request):
+        accepted = accepted_encodings(request)
+        for encoding in compression.available_encodings():
+            if encoding in accepted:
+                return encoding
+        return None
+
+    def is_shared(self, request, response):
+        """Одинаков ли ответ для всех посетителей."""
+        user = getattr(request, 'user', None)
+        return not response.cookies and not (
+            user is not None and user.is_authenticated
+        )
+
+    def encode(self, request, response, encoding):
+        key = None
+        if encoding is not None and self.is_shared(request, response):
+            key = compression.content_key(response.content, encoding)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        content = response.content
+        if settings.HTML_MINIFY and response['Content-Type'].startswith(
+            'text/html'
+        ):
+            charset = response.charset
+            content = compression.minify_html(
+                content.decode(charset)
+            ).encode(charset)
+        if encoding is not None:
+            content = compression.compress(content, encoding)
+        if key is not None:
+            cache.set(key, content, settings.COMPRESSION_CACHE_TIMEOUT)
+        return content
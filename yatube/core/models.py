@@ -1,12 +1,49 @@
 from django.db import models
+from django.utils import timezone
 
 
 class CreatedModel(models.Model):
     """Абстрактная модель. Добавляет дату создания."""
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
-        auto_now_add=True
+        auto_now_add=True,
+        db_index=True
     )
 
     class Meta:
         abstract = True
+
+
+class OutboxMessage(models.Model):
+    """Письмо, ожидающее отправки воркером send_outbox."""
+    message = models.BinaryField(verbose_name='Письмо')
+    subject = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Тема'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+    next_attempt = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name='Следующая попытка'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток отправки'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+
+    class Meta:
+        ordering = ['next_attempt']
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+
+    def __str__(self):
+        return self.subject
@@ -0,0 +1,134 @@
+"""Отдача файлов с диска с условными запросами и заголовками кеша."""
+import mimetypes
+import os
+import re
+
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+# Год: срок хранения файлов, имя которых меняется вместе с содержимым.
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """Файл, из которого читается только диапазон байтов.
+
+    Файловый дескриптор доступен серверу через fileno(), поэтому
+    wsgi.file_wrapper (например, в gunicorn) отправит диапазон через
+    sendfile, ориентируясь на текущую позицию и Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(stat):
+    return quote_etag(f'{int(stat.st_mtime):x}-{stat.st_size:x}')
+
+
+def parse_range(request, size, etag, mtime):
+    """Возвращает (начало, конец) запрошенного диапазона.
+
+    None — отдать файл целиком: заголовка нет, он не разобран,
+    в нём несколько диапазонов или If-Range не совпал.
+    Если диапазон вне файла, возвращается пустой кортеж.
+    """
+    header = request.META.get('HTTP_RANGE', '').replace(' ', '')
+    match = RANGE_RE.match(header)
+    if not match or not any(match.groups()):
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag:
+        if parse_http_date_safe(if_range) != int(mtime):
+            return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-N: последние N байтов.
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return ()
+    return start, end
+
+
+def serve_file(request, fullpath, stat=None, content_type=None,
+               encoding=None, immutable=False, max_age=0):
+    """Возвращает FileResponse для файла на диске.
+
+    Учитывает If-None-Match, If-Modified-Since и Range, для HEAD-запроса
+    не открывает файл. `encoding` — Content-Encoding заранее сжатого
+    варианта, `content_type` в этом случае берётся от исходного файла.
+    """
+    if stat is None:
+        stat = os.stat(fullpath)
+    etag = file_etag(stat)
+    if content_type is None:
+        content_type, _ = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        byte_range = parse_range(request, stat.st_size, etag, stat.st_mtime)
+        if byte_range == ():
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif request.method == 'HEAD':
+            response = FileResponse(content_type=content_type)
+            response['Content-Length'] = stat.st_size
+        elif byte_range:
+            start, end = byte_range
+            response = FileResponse(
+                FileRange(open(fullpath, 'rb'), start, end - start + 1),
+                content_type=content_type, status=206,
+            )
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = (
+                f'bytes {start}-{end}/{stat.st_size}'
+            )
+        else:
+            response = FileResponse(
+                open(fullpath, 'rb'), content_type=content_type
+            )
+            response['Content-Length'] = stat.st_size
+        response['Accept-Ranges'] = 'bytes'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    patch_file_cache_control(response, immutable, max_age)
+    return response
+
+
+def patch_file_cache_control(response, immutable=False, max_age=0):
+    if immutable:
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
@@ -0,0 +1,52 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.contrib.staticfiles.utils import matches_patterns
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Форматы, которые имеет смысл сжимать: картинки уже сжаты.
+COMPRESSIBLE_PATTERNS = (
+    '*.css', '*.js', '*.svg', '*.ico', '*.txt', '*.json', '*.xml', '*.map',
+)
+
+
+def compressors():
+    """Доступные алгоритмы сжатия: расширение файла и функция."""
+    available = [('gz', lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        available.append(('br', lambda data: brotli.compress(data)))
+    return available
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хранилище статики с хешами в именах и заранее сжатыми копиями.
+
+    После collectstatic рядом с каждым файлом лежат `<имя>.gz`
+    и, если установлен пакет brotli, `<имя>.br`.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if matches_patterns(name, COMPRESSIBLE_PATTERNS):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as original:
+            data = original.read()
+        for extension, compress in compressors():
+            compressed_name = f'{name}.{extension}'
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            compressed = compress(data)
+            # Сжатая копия, которая не меньше оригинала, не нужна.
+            if len(compressed) < len(data):
+                self._save(compressed_name, ContentFile(compressed))
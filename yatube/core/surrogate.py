@@ -0,0 +1,98 @@
+"""Метки (surrogate keys) для кеширующего прокси и их сброс.
+
+Представление помечает ответ ключами объектов, которые в нём показаны
+(add_keys), а SurrogateKeyMiddleware отдаёт их прокси в заголовке
+Surrogate-Key вместе с Cache-Control для анонимных посетителей. После
+изменения объекта purge() просит прокси сбросить все ответы с его
+ключом. Как именно сбрасывать, решает класс из SURROGATE_PURGER.
+"""
+import logging
+from collections import deque
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Ключи, сброшенные LocalPurger, — как mail.outbox для писем.
+purged = deque(maxlen=1000)
+
+
+class LocalPurger:
+    """Заглушка вместо прокси: запоминает сброшенные ключи."""
+
+    def purge(self, keys):
+        purged.extend(keys)
+
+
+class HTTPPurger:
+    """Сбрасывает ключи запросом к прокси (PURGE с заголовком ключей,
+    как у Varnish xkey и Fastly)."""
+
+    def __init__(self):
+        self.session = requests.Session()
+
+    def purge(self, keys):
+        try:
+            response = self.session.request(
+                settings.SURROGATE_PURGE_METHOD,
+                settings.SURROGATE_PURGE_URL,
+                headers={settings.SURROGATE_PURGE_HEADER: ' '.join(keys)},
+                timeout=settings.SURROGATE_PURGE_TIMEOUT,
+            )
+            response.raise_for_status()
+        except requests.RequestException:
+            logger.exception('Не удалось сбросить ключи %s', keys)
+
+
+@lru_cache(maxsize=None)
+def get_purger():
+    return import_string(settings.SURROGATE_PURGER)()
+
+
+def purge(*keys):
+    """Сбрасывает ключи в прокси после фиксации текущей транзакции."""
+    keys = sorted({key for key in keys if key})
+    if keys:
+        transaction.on_commit(lambda: get_purger().purge(keys))
+
+
+def add_keys(request, *keys):
+    """Помечает ответ на запрос ключами показанных объектов."""
+    if not hasattr(request, 'surrogate_keys'):
+        request.surrogate_keys = set()
+    request.surrogate_keys.update(key for key in keys if key)
+
+
+class SurrogateKeyMiddleware:
+    """Разрешает прокси кешировать помеченные ответы анонимным
+    посетителям и передаёт ему ключи ответа."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        keys = getattr(request, 'surrogate_keys', None)
+        if not keys or response.has_header('Cache-Control'):
+            return response
+        user = getattr(request, 'user', None)
+        if (
+            request.method not in ('GET', 'HEAD')
+            or response.status_code != 200
+            or response.cookies
+            or (user is not None and user.is_authenticated)
+        ):
+            patch_cache_control(response, private=True)
+            return response
+        response['Surrogate-Key'] = ' '.join(sorted(keys))
+        patch_cache_control(
+            response, public=True, max_age=0,
+            s_maxage=settings.SURROGATE_MAX_AGE,
+        )
+        patch_vary_headers(response, ('Cookie',))
+        return response
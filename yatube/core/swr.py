@@ -0,0 +1,91 @@
+"""Кеширование с защитой от лавины пересчётов (stale-while-revalidate).
+
+В кеше хранится тройка (значение, момент устаревания, время расчёта).
+Запись живёт в кеше дольше, чем остаётся свежей: после устаревания
+значение ещё stale_timeout секунд отдаётся как есть, а пересчитывает его
+только один запрос — тот, кому удалось взять блокировку через cache.add().
+
+Чтобы пересчёт не совпадал с моментом устаревания, используется
+вероятностное досрочное обновление (XFetch): чем дольше считается
+значение и чем ближе устаревание, тем вероятнее, что очередной запрос
+обновит его заранее.
+"""
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+
+# Отметка о том, что значения в кеше нет.
+MISSING = object()
+# Пауза между проверками кеша, пока значение считает другой запрос.
+WAIT_STEP = 0.05
+
+
+def lock_key(key):
+    return f'swr:lock:{key}'
+
+
+def should_refresh(fresh_until, delta, beta, now=None):
+    """Решает, пора ли пересчитывать значение (XFetch)."""
+    if now is None:
+        now = time.time()
+    # 1 - random() лежит в (0, 1], поэтому логарифм определён.
+    early = -delta * beta * math.log(1 - random.random())
+    return now + early >= fresh_until
+
+
+def recompute(key, compute, timeout, stale_timeout, cache=None):
+    """Считает значение и сохраняет его вместе с метаданными."""
+    cache = cache or default_cache
+    start = time.time()
+    value = compute()
+    now = time.time()
+    entry = (value, now + timeout, now - start)
+    cache.set(key, entry, timeout + stale_timeout)
+    return value
+
+
+def wait_for(key, cache):
+    """Ждёт, пока значение посчитает запрос, держащий блокировку."""
+    deadline = time.time() + settings.SWR_LOCK_WAIT
+    while time.time() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key, MISSING)
+        if entry is not MISSING:
+            return entry[0]
+    return MISSING
+
+
+def get_or_compute(key, compute, timeout, stale_timeout=None, beta=None,
+                   cache=None):
+    """Значение из кеша по ключу `key` или результат `compute()`.
+
+    Устаревшее значение отдаётся, пока его пересчитывает другой запрос.
+    Если значения нет совсем, запрос без блокировки недолго ждёт
+    результата соседа и только потом считает сам.
+    """
+    cache = cache or default_cache
+    if stale_timeout is None:
+        stale_timeout = settings.SWR_STALE_TIMEOUT
+    if beta is None:
+        beta = settings.SWR_BETA
+
+    entry = cache.get(key, MISSING)
+    if entry is not MISSING:
+        value, fresh_until, delta = entry
+        if not should_refresh(fresh_until, delta, beta):
+            return value
+    locked = cache.add(lock_key(key), True, settings.SWR_LOCK_TIMEOUT)
+    if not locked:
+        if entry is not MISSING:
+            return value
+        value = wait_for(key, cache)
+        if value is not MISSING:
+            return value
+    try:
+        return recompute(key, compute, timeout, stale_timeout, cache)
+    finally:
+        if locked:
+            cache.delete(lock_key(key))
@@ -0,0 +1,67 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import TemplateSyntaxError, VariableDoesNotExist
+from django.templatetags.cache import CacheNode, do_cache
+
+from core import swr
+
+register = template.Library()
+
+
+class StaleWhileRevalidateNode(CacheNode):
+    """Фрагмент, который отдаётся устаревшим, пока его пересчитывает
+    один запрос."""
+
+    def get_cache(self, context):
+        if not self.cache_name:
+            try:
+                return caches['template_fragments']
+            except InvalidCacheBackendError:
+                return caches['default']
+        try:
+            cache_name = self.cache_name.resolve(context)
+        except VariableDoesNotExist:
+            raise TemplateSyntaxError(
+                '"cache" tag got an unknown variable: %r'
+                % self.cache_name.var
+            )
+        try:
+            return caches[cache_name]
+        except InvalidCacheBackendError:
+            raise TemplateSyntaxError(
+                'Invalid cache name specified for cache tag: %r' % cache_name
+            )
+
+    def render(self, context):
+        try:
+            expire_time = int(self.expire_time_var.resolve(context))
+        except VariableDoesNotExist:
+            raise TemplateSyntaxError(
+                '"cache" tag got an unknown variable: %r'
+                % self.expire_time_var.var
+            )
+        except (ValueError, TypeError):
+            raise TemplateSyntaxError(
+                '"cache" tag got a non-integer timeout value: %r'
+                % self.expire_time_var.var
+            )
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = 'swr:' + make_template_fragment_key(self.fragment_name, vary_on)
+        return swr.get_or_compute(
+            key,
+            lambda: self.nodelist.render(context),
+            expire_time,
+            cache=self.get_cache(context),
+        )
+
+
+@register.tag('cache')
+def do_swr_cache(parser, token):
+    """Замена тега {% cache %} с тем же синтаксисом: устаревший фрагмент
+    отдаётся, пока его пересчитывает один запрос."""
+    node = do_cache(parser, token)
+    return StaleWhileRevalidateNode(
+        node.nodelist, node.expire_time_var, node.fragment_name,
+        node.vary_on, node.cache_name,
+    )
@@ -1,3 +1,534 @@
-# from django.test import TestCase
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import compression, storage, swr, throttle, versioning
+from core.cache import TwoLevelCache
+from core.kvstore import KVStore, LRUCache
+from core.mail import claim_batch, send_batch
+from core.models import OutboxMessage
+
+LOCMEM_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+TEMP_STATIC_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.OutboxEmailBackend',
+    OUTBOX_EMAIL_BACKEND=LOCMEM_BACKEND,
+)
+class OutboxTest(TestCase):
+    def test_message_is_queued_not_sent(self):
+        """Письмо попадает в очередь, а не отправляется сразу."""
+        EmailMessage('Тема', 'Текст', to=['user@example.com']).send()
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_worker_sends_queued_messages(self):
+        """Воркер отправляет письма из очереди и удаляет их."""
+        for number in range(3):
+            EmailMessage(f'Тема {number}', 'Текст', to=['a@b.ru']).send()
+        self.assertEqual(send_batch(), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_failed_message_is_retried_later(self):
+        """Неудачная отправка откладывается с растущей задержкой."""
+        EmailMessage('Тема', 'Текст', to=['user@example.com']).send()
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=OSError('SMTP недоступен'),
+        ):
+            self.assertEqual(send_batch(), (0, 1))
+        outbox_message = OutboxMessage.objects.get()
+        self.assertEqual(outbox_message.attempts, 1)
+        self.assertGreater(outbox_message.next_attempt, timezone.now())
+        self.assertEqual(send_batch(), (0, 0))
+
+    def test_message_is_claimed_once(self):
+        """Письмо, выбранное двумя воркерами, достаётся одному."""
+        for number in range(3):
+            EmailMessage(f'Тема {number}', 'Текст', to=['a@b.ru']).send()
+        update = QuerySet.update
+        other = []
+
+        def race(queryset, **kwargs):
+            # Другой воркер арендует те же письма между выборкой и
+            # арендой первого.
+            if not other:
+                other.append(None)
+                other[:] = claim_batch(10)
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', race):
+            claimed = claim_batch(10)
+        self.assertEqual(len(other), 3)
+        self.assertEqual(claimed, [])
+
+
+class TwoLevelCacheTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        location = os.path.join(directory, 'cache.sqlite3')
+        params = {'OPTIONS': {'SYNC_INTERVAL': 0}}
+        # Два экземпляра с общим L2 ведут себя как два процесса.
+        self.first = TwoLevelCache(location, params)
+        self.second = TwoLevelCache(location, params)
+
+    def test_value_is_shared_through_l2(self):
+        """Значение, записанное одним процессом, видно другому."""
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        stats = self.second.stats()
+        self.assertEqual((stats['l2_hits'], stats['l1_hits']), (1, 1))
+
+    def test_invalidation_reaches_other_process(self):
+        """Изменение и удаление ключа выбрасывают его из чужого L1."""
+        self.first.set('key', 'old')
+        self.second.get('key')
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+        self.second.set('other', 1)
+        self.first.clear()
+        self.assertIsNone(self.second.get('other'))
+
+    def test_incr_and_add(self):
+        """incr и add работают поверх общего L2."""
+        self.first.set('counter', 1)
+        self.assertEqual(self.second.incr('counter'), 2)
+        self.assertEqual(self.first.get('counter'), 2)
+        self.assertFalse(self.first.add('counter', 10))
+        self.assertTrue(self.first.add('fresh', 10, timeout=60))
+
+    def test_get_many_reads_l2_once(self):
+        """get_many читает промахи L1 одним запросом к L2."""
+        for number in range(5):
+            self.first.set(f'key{number}', number)
+        self.second.get('key0')
+        statements = []
+        self.second._db.set_trace_callback(statements.append)
+        values = self.second.get_many(
+            [f'key{number}' for number in range(6)]
+        )
+        self.assertEqual(values, {f'key{n}': n for n in range(5)})
+        reads = [sql for sql in statements if 'FROM cache_entries' in sql]
+        self.assertEqual(len(reads), 1)
+        statements.clear()
+        self.second.get_many(['key1', 'key4'])
+        self.assertFalse(
+            [sql for sql in statements if 'FROM cache_entries' in sql]
+        )
+
+    def test_update_reads_past_stale_l1(self):
+        """update читает значение из L2, даже если в L1 оно устарело."""
+        first = TwoLevelCache(self.first.location, {})
+        first.set('counter', 1)
+        self.second.update('counter', lambda value: (value + 1, value))
+        self.assertEqual(
+            first.update('counter', lambda value: (value + 1, value)), 2
+        )
+        self.assertEqual(
+            self.second.update('missing', lambda value: (1, value)), None
+        )
+
+    def test_culled_keys_leave_other_l1(self):
+        """Ключи, вытесненные из L2, пропадают и из чужого L1."""
+        self.second.set('old', 'value')
+        self.first.get('old')
+        self.first._max_entries = 1
+        self.first._cull_frequency = 1
+        self.second.set('new', 'value')
+        self.first._cull()
+        self.assertIsNone(self.first.get('old'))
+
+
+class VersioningTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_version(self):
+        """Версия стабильна до bump() и меняется после него, в том числе
+        если ключ пропал из кеша."""
+        version = versioning.get('test:version')
+        self.assertEqual(versioning.get('test:version'), version)
+        versioning.bump('test:version')
+        self.assertNotEqual(versioning.get('test:version'), version)
+        cache.delete('test:version')
+        versioning.bump('test:version')
+        self.assertIsNotNone(versioning.get('test:version'))
+
+
+class LRUCacheTest(TestCase):
+    def test_least_recently_used_is_evicted(self):
+        """При переполнении вытесняется давно не читанная запись."""
+        lru = LRUCache(2, 60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b')), (1, None))
+
+    def test_entries_expire(self):
+        """Запись перестаёт отдаваться по истечении времени жизни."""
+        lru = LRUCache(2, 60)
+        with mock.patch('core.kvstore.time.monotonic', return_value=0):
+            lru.set('a', 1)
+        with mock.patch('core.kvstore.time.monotonic', return_value=59):
+            self.assertEqual(lru.get('a'), 1)
+        with mock.patch('core.kvstore.time.monotonic', return_value=60):
+            self.assertIsNone(lru.get('a'))
+
+
+class KVStoreTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.settings_override = self.settings(
+            THUMBNAIL_KVSTORE_FILE=os.path.join(directory, 'kv.sqlite3'),
+            THUMBNAIL_KVSTORE_LRU_TIMEOUT=60,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        # Два экземпляра с общим файлом ведут себя как два процесса.
+        self.first = KVStore()
+        self.second = KVStore()
+
+    def count_queries(self, store):
+        queries = []
+        store.connection.set_trace_callback(queries.append)
+        return queries
+
+    def test_value_is_shared_through_file(self):
+        """Запись одного процесса видна другому и затем читается
+        из памяти."""
+        self.first._set_raw('key', 'value')
+        self.assertEqual(self.second._get_raw('key'), 'value')
+        queries = self.count_queries(self.second)
+        self.assertEqual(self.second._get_raw('key'), 'value')
+        self.assertEqual(queries, [])
+
+    def test_other_process_delete_is_seen_after_timeout(self):
+        """Удаление в другом процессе видно после истечения записи LRU."""
+        self.first._set_raw('key', 'value')
+        self.second._get_raw('key')
+        self.first._delete_raw('key')
+        self.assertEqual(self.second._get_raw('key'), 'value')
+        later = time.monotonic() + 61
+        with mock.patch('core.kvstore.time.monotonic', return_value=later):
+            self.assertIsNone(self.second._get_raw('key'))
+
+    def test_prefetch_loads_page_in_one_query(self):
+        """prefetch() загружает записи страницы одним запросом, а
+        отсутствующие ключи запоминает."""
+        self.first._set_raw('sorl-thumbnail||image||one', 'value')
+        files = [SimpleNamespace(key='one'), SimpleNamespace(key='two')]
+        queries = self.count_queries(self.second)
+        self.second.prefetch(files)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            self.second._get_raw('sorl-thumbnail||image||one'), 'value'
+        )
+        self.assertIsNone(self.second._get_raw('sorl-thumbnail||image||two'))
+        self.assertEqual(len(queries), 1)
+
+
+class ThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_invalid_rates_are_rejected(self):
+        """Нулевая, отрицательная и нераспознанная частота — ошибка."""
+        self.assertEqual(throttle.parse_rate('10/m'), (10, 10 / 60))
+        for rate in ('0/m', '-1/m', 'ten/m', '10/w', '10'):
+            with self.subTest(rate=rate):
+                with self.assertRaises(ValueError):
+                    throttle.parse_rate(rate)
+
+    def test_invalid_settings_fail_at_startup(self):
+        """Неверная частота в настройках обнаруживается при запуске."""
+        with self.settings(THROTTLE_RATES={'post': '0/m'}):
+            with self.assertRaises(ImproperlyConfigured):
+                throttle.validate_rates()
+        with self.settings(THROTTLE_RATES={'post': None}):
+            throttle.validate_rates()
+
+    def test_parallel_requests_share_bucket(self):
+        """Параллельные запросы не тратят один токен дважды ни через
+        update, ни под блокировкой."""
+        for backend in (cache, LocMemCache('throttle-parallel', {})):
+            with self.subTest(backend=type(backend).__name__):
+                capacity = 3
+                barrier = threading.Barrier(8)
+                results = []
+
+                def request():
+                    barrier.wait()
+                    results.append(
+                        throttle.take_token('bucket', capacity, 0.001)
+                    )
+
+                threads = [
+                    threading.Thread(target=request) for _ in range(8)
+                ]
+                with mock.patch('core.throttle.cache', backend):
+                    for thread in threads:
+                        thread.start()
+                    for thread in threads:
+                        thread.join()
+                self.assertEqual(results.count(0), capacity)
+
+    def test_processes_share_bucket(self):
+        """Процессы с устаревшим L1 не тратят один токен дважды."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        location = os.path.join(directory, 'cache.sqlite3')
+        # Два экземпляра с общим L2 ведут себя как два процесса.
+        workers = [TwoLevelCache(location, {}) for _ in range(2)]
+        results = []
+        for number in range(6):
+            with mock.patch('core.throttle.cache', workers[number % 2]):
+                results.append(throttle.take_token('bucket', 2, 2 / 60))
+        self.assertEqual(results.count(0), 2)
+
+    def test_busy_bucket_is_rejected(self):
+        """Если корзину не удаётся заблокировать, запрос отклоняется."""
+        backend = LocMemCache('throttle-busy', {})
+        backend.add('bucket:lock', 1)
+        with mock.patch('core.throttle.cache', backend):
+            with mock.patch('core.throttle.time.sleep'):
+                self.assertEqual(throttle.take_token('bucket', 3, 1), 1)
+            backend.delete('bucket:lock')
+            self.assertEqual(throttle.take_token('bucket', 3, 1), 0)
+
+
+class StaleWhileRevalidateTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+    def compute(self):
+        self.calls.append(1)
+        return len(self.calls)
+
+    def expire(self, key):
+        value, _, delta = cache.get(key)
+        cache.set(key, (value, 0, delta))
+
+    def test_fresh_value_is_not_recomputed(self):
+        """Свежее значение берётся из кеша."""
+        swr.get_or_compute('swr-test', self.compute, 60, beta=0)
+        self.assertEqual(
+            swr.get_or_compute('swr-test', self.compute, 60, beta=0), 1
+        )
+
+    def test_stale_value_is_served_while_locked(self):
+        """Пока значение пересчитывает другой запрос, отдаётся старое."""
+        swr.get_or_compute('swr-test', self.compute, 60, beta=0)
+        self.expire('swr-test')
+        cache.add(swr.lock_key('swr-test'), True)
+        self.assertEqual(
+            swr.get_or_compute('swr-test', self.compute, 60, beta=0), 1
+        )
+        self.assertEqual(len(self.calls), 1)
+
+    def test_stale_value_is_recomputed_by_lock_holder(self):
+        """Устаревшее значение пересчитывает получивший блокировку."""
+        swr.get_or_compute('swr-test', self.compute, 60, beta=0)
+        self.expire('swr-test')
+        self.assertEqual(
+            swr.get_or_compute('swr-test', self.compute, 60, beta=0), 2
+        )
+        self.assertIsNone(cache.get(swr.lock_key('swr-test')))
+
+    def test_early_refresh_grows_with_compute_time(self):
+        """Долгий расчёт обновляется заранее, мгновенный — нет."""
+        with mock.patch('core.swr.random.random', return_value=0.9):
+            self.assertTrue(swr.should_refresh(100, 10, 1.0, now=90))
+            self.assertFalse(swr.should_refresh(100, 0, 1.0, now=90))
+
+
+class CompressionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_minify_keeps_preformatted_blocks(self):
+        """Пробелы сворачиваются везде, кроме <pre> и подобных блоков."""
+        html = '<p>\n    a    b\n</p>  <pre>  x\n   y</pre>'
+        self.assertEqual(
+            compression.minify_html(html),
+            '<p>\na b\n</p> <pre>  x\n   y</pre>',
+        )
+
+    def test_page_is_compressed_and_cached(self):
+        """Страница сжимается, а повторный ответ берётся из кеша."""
+        url = reverse('about:author')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        html = gzip.decompress(response.content).decode()
+        self.assertIn('</html>', html)
+        self.assertNotIn('\n  ', html)
+        with mock.patch('core.compression.compress') as compress:
+            repeated = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        compress.assert_not_called()
+        self.assertEqual(repeated.content, response.content)
+
+    def test_streaming_response_is_compressed(self):
+        """Потоковый ответ сжимается по частям."""
+        response = self.client.get(
+            reverse('posts:sitemap'), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertIn(b'</sitemapindex>', content)
+
+
+@override_settings(
+    STATICFILES_DIRS=(os.path.join(TEMP_STATIC_DIR, 'source'),),
+    STATICFILES_FINDERS=(
+        'django.contrib.staticfiles.finders.FileSystemFinder',
+    ),
+    STATIC_ROOT=os.path.join(TEMP_STATIC_DIR, 'root'),
+)
+class StaticFilesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.css = b'body { margin: 0; padding: 0; }\n' * 50
+        cls.sources = {
+            'css/app.css': cls.css,
+            'img/logo.png': os.urandom(1024),
+            'tiny.txt': b'x',
+        }
+        for name, content in cls.sources.items():
+            path = os.path.join(TEMP_STATIC_DIR, 'source', name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(content)
+        # Файл рядом с STATIC_ROOT, до которого не должно быть доступа.
+        with open(os.path.join(TEMP_STATIC_DIR, 'secret.txt'), 'wb') as file:
+            file.write(b'top secret content')
+        # Шаблоны страниц 404 берут статику из обычного хранилища, а
+        # middleware читает манифест собранной здесь статики.
+        cls.storage = storage.CompressedManifestStaticFilesStorage()
+        with mock.patch.object(
+            staticfiles_storage, '_wrapped', cls.storage
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        cls.root = os.path.join(TEMP_STATIC_DIR, 'root')
+        cls.hashed_css = cls.storage.stored_name('css/app.css')
+
+    def setUp(self):
+        patcher = mock.patch(
+            'core.middleware.staticfiles_storage', self.storage
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_DIR, ignore_errors=True)
+
+    def get(self, name, **headers):
+        response = self.client.get(f'/static/{name}', **headers)
+        if response.streaming:
+            response.body = b''.join(response.streaming_content)
+        response.close()
+        return response
+
+    def test_precompressed_copies(self):
+        """collectstatic сжимает текстовые файлы, но не картинки и не
+        файлы, которые от сжатия не уменьшаются."""
+        for name in ('css/app.css', self.hashed_css):
+            with open(os.path.join(self.root, name + '.gz'), 'rb') as file:
+                self.assertEqual(gzip.decompress(file.read()), self.css)
+        hashed_png = self.storage.stored_name('img/logo.png')
+        for name in ('img/logo.png', hashed_png, 'tiny.txt'):
+            with self.subTest(name=name):
+                self.assertFalse(
+                    os.path.exists(os.path.join(self.root, name + '.gz'))
+                )
+        self.assertEqual(
+            os.path.exists(os.path.join(self.root, 'css/app.css.br')),
+            storage.brotli is not None,
+        )
+
+    def test_gzip_copy_is_served(self):
+        """Клиенту, принимающему gzip, отдаётся сжатая копия."""
+        response = self.get(self.hashed_css, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.body), self.css)
+
+    def test_brotli_is_preferred(self):
+        """Если клиент принимает brotli и копия .br есть, отдаётся она."""
+        path = os.path.join(self.root, self.hashed_css + '.br')
+        if not os.path.exists(path):
+            with open(path, 'wb') as file:
+                file.write(b'brotli')
+            self.addCleanup(os.remove, path)
+        response = self.get(
+            self.hashed_css, HTTP_ACCEPT_ENCODING='gzip, deflate, br'
+        )
+        self.assertEqual(response['Content-Encoding'], 'br')
+        with open(path, 'rb') as file:
+            self.assertEqual(response.body, file.read())
+
+    def test_refused_encoding_is_not_used(self):
+        """Без Accept-Encoding или с q=0 отдаётся исходный файл."""
+        for header in ('', 'gzip;q=0, br;q=0', 'identity'):
+            with self.subTest(header=header):
+                response = self.get(
+                    self.hashed_css, HTTP_ACCEPT_ENCODING=header
+                )
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertEqual(response.body, self.css)
+
+    def test_only_manifest_names_are_immutable(self):
+        """Вечно кешируются только имена с хешем из манифеста."""
+        response = self.get(self.hashed_css)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        response = self.get('css/app.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=0', response['Cache-Control'])
+
+    def test_missing_file_is_not_found(self):
+        """Отсутствующий файл и каталог дают 404."""
+        for name in ('css/missing.css', 'css/', 'css'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+
+    def test_path_traversal_is_not_served(self):
+        """Файлы вне STATIC_ROOT не отдаются."""
+        names = ('../secret.txt', '%2e%2e/secret.txt', 'css/../../secret.txt')
+        for name in names:
+            with self.subTest(name=name):
+                response = self.get(name)
+                self.assertEqual(response.status_code, 404)
+                self.assertNotIn(b'top secret content', response.content)
@@ -0,0 +1,129 @@
+"""Ограничение частоты записей алгоритмом token bucket.
+
+Состояние корзины — пара (токены, время) в кеше. Бэкенд с методом
+update (core.cache.TwoLevelCache) читает и записывает корзину одной
+транзакцией общего хранилища. Для остальных бэкендов чтение и запись
+выполняются под блокировкой — ключом, который создаёт атомарный
+cache.add. В обоих случаях параллельные запросы одного клиента не
+тратят один и тот же токен. Авторизованные пользователи ограничиваются
+по id, анонимные — по IP-адресу.
+"""
+import math
+import re
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.shortcuts import render
+
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+RATE_RE = re.compile(r'^(\d+)/([smhd])')
+# Через сколько секунд блокировка корзины снимается сама, если процесс
+# упал, не успев её снять.
+LOCK_TIMEOUT = 5
+# Сколько раз и с какой паузой пытаться взять занятую блокировку.
+LOCK_ATTEMPTS = 50
+LOCK_WAIT = 0.002
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 10 / 60): ёмкость корзины и токенов в секунду."""
+    match = RATE_RE.match(rate)
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(
+            f'Частота {rate!r} не в формате <число больше 0>/<s|m|h|d>'
+        )
+    count = int(match.group(1))
+    return count, count / RATE_PERIODS[match.group(2)]
+
+
+def validate_rates():
+    """Проверяет THROTTLE_RATES при запуске, а не на первом запросе."""
+    for scope, rate in settings.THROTTLE_RATES.items():
+        if not rate:
+            continue
+        try:
+            parse_rate(rate)
+        except ValueError as error:
+            raise ImproperlyConfigured(
+                f'THROTTLE_RATES[{scope!r}]: {error}'
+            ) from error
+
+
+def client_ident(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return 'ip:' + request.META.get(settings.THROTTLE_IP_HEADER, '')
+
+
+@contextmanager
+def bucket_lock(key):
+    """Блокировка корзины. Отдаёт False, если её не удалось взять."""
+    lock = f'{key}:lock'
+    for _ in range(LOCK_ATTEMPTS):
+        if cache.add(lock, 1, LOCK_TIMEOUT):
+            try:
+                yield True
+            finally:
+                cache.delete(lock)
+            return
+        time.sleep(LOCK_WAIT)
+    yield False
+
+
+def spend_token(bucket, capacity, refill_rate):
+    """Новое состояние корзины и 0 или сколько секунд ждать токена."""
+    now = time.time()
+    tokens, updated = bucket or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * refill_rate)
+    if tokens < 1:
+        return (tokens, now), math.ceil((1 - tokens) / refill_rate)
+    return (tokens - 1, now), 0
+
+
+def take_token(key, capacity, refill_rate):
+    """Забирает токен из корзины. Возвращает 0, если запрос разрешён,
+    иначе — сколько секунд ждать следующего токена."""
+    timeout = math.ceil(capacity / refill_rate)
+
+    def spend(bucket):
+        return spend_token(bucket, capacity, refill_rate)
+
+    if hasattr(cache, 'update'):
+        return cache.update(key, spend, timeout)
+    with bucket_lock(key) as locked:
+        if not locked:
+            # Корзину долго держат параллельные запросы того же клиента.
+            return 1
+        bucket, retry_after = spend(cache.get(key))
+        cache.set(key, bucket, timeout)
+    return retry_after
+
+
+def throttle(scope, methods=('POST',)):
+    """Ограничивает запросы к представлению по THROTTLE_RATES[scope].
+
+    Отклонённый запрос получает ответ 429 до того, как представление
+    начнёт проверять форму или обращаться к БД.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            rate = settings.THROTTLE_RATES.get(scope)
+            if rate and request.method in methods:
+                capacity, refill_rate = parse_rate(rate)
+                key = f'throttle:{scope}:{client_ident(request)}'
+                retry_after = take_token(key, capacity, refill_rate)
+                if retry_after:
+                    response = render(
+                        request, 'core/429.html',
+                        {'retry_after': retry_after}, status=429
+                    )
+                    response['Retry-After'] = retry_after
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
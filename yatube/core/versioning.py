@@ -0,0 +1,30 @@
+"""Версии в общем кеше.
+
+Версия помечает устаревшими данные, которые процессы или другие ключи
+кеша хранят под ней: get() возвращает текущую версию, bump()
+увеличивает её. Начальная версия берётся от времени в миллисекундах,
+поэтому после потери ключа в кеше она не совпадёт с версией, которую
+ещё помнит какой-нибудь процесс.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _initial():
+    return int(time.time() * 1000)
+
+
+def get(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial(), None)
@@ -1,4 +1,15 @@
+import mimetypes
+import os
+import posixpath
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils._os import safe_join
+
+from .serving import patch_file_cache_control, serve_file
 
 
 def page_not_found(request, exception):
@@ -15,3 +26,45 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def media(request, path):
+    """Отдаёт загруженные файлы из MEDIA_ROOT.
+
+    Если задан MEDIA_OFFLOAD, сам файл отправляет прокси-сервер
+    по заголовку X-Accel-Redirect или X-Sendfile. Иначе файл отдаётся
+    через FileResponse, который WSGI-сервер передаёт через sendfile.
+    Миниатюры sorl-thumbnail не меняются и кешируются навсегда.
+    """
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден.')
+    try:
+        stat = os.stat(fullpath)
+    except OSError:
+        raise Http404('Файл не найден.')
+    if not os.path.isfile(fullpath):
+        raise Http404('Файл не найден.')
+    immutable = path.startswith(settings.THUMBNAIL_PREFIX)
+    offload = settings.MEDIA_OFFLOAD
+    if offload == 'x-sendfile' and not fullpath.isascii():
+        # Не-ASCII заголовок Django кодирует по RFC 2047, а X-Sendfile
+        # ждёт путь к файлу как есть: такой файл отдаём сами.
+        offload = None
+    if offload == 'x-accel-redirect':
+        response = HttpResponse(content_type=mimetypes.guess_type(path)[0])
+        # nginx раскодирует URI из X-Accel-Redirect сам.
+        response['X-Accel-Redirect'] = quote(
+            posixpath.join(settings.MEDIA_ACCEL_PREFIX, path)
+        )
+    elif offload == 'x-sendfile':
+        response = HttpResponse(content_type=mimetypes.guess_type(path)[0])
+        response['X-Sendfile'] = fullpath
+    else:
+        return serve_file(
+            request, fullpath, stat=stat, immutable=immutable,
+            max_age=settings.MEDIA_MAX_AGE,
+        )
+    patch_file_cache_control(response, immutable, settings.MEDIA_MAX_AGE)
+    return response
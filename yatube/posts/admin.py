@@ -1,6 +1,8 @@
+from core.admin import QueuedDeletionMixin
 from django.contrib import admin
 
-from .models import Comment, Group, Post
+from . import deletion
+from .models import ArchivedPost, Comment, DeletionTask, Group, Post
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -17,8 +19,30 @@ class CommentAdmin(admin.ModelAdmin):
     list_filter = ('created',)
 
 
+class ArchivedPostAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
+    search_fields = ('text',)
+    list_filter = ('pub_date',)
+    empty_value_display = '-пусто-'
+
+
+class GroupAdmin(QueuedDeletionMixin, admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug',)
+    search_fields = ('title',)
+    enqueue = staticmethod(deletion.enqueue)
+
+
+class DeletionTaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'kind', 'object_id', 'created',)
+    list_filter = ('kind',)
+
+
 admin.site.register(Post, PostAdmin)
 
-admin.site.register(Group)
+admin.site.register(ArchivedPost, ArchivedPostAdmin)
+
+admin.site.register(Group, GroupAdmin)
 
 admin.site.register(Comment, CommentAdmin)
+
+admin.site.register(DeletionTask, DeletionTaskAdmin)
@@ -0,0 +1,169 @@
+"""Архив старых постов.
+
+Команда archive_posts пачками переносит посты старше
+POST_ARCHIVE_AFTER_DAYS вместе с комментариями в таблицы ArchivedPost
+и ArchivedComment, сохраняя их id. Оперативная таблица Post остаётся
+небольшой, а все архивные посты старше всех оперативных.
+
+Ленты читают архив через ChainedFeed, только когда страница выходит
+за последний оперативный пост. Число архивных постов ленты хранится
+в кеше до следующего запуска архивации.
+"""
+from datetime import timedelta
+
+from core import versioning
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+
+from . import group_stats
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+from .rendering import RENDERED_FIELDS
+
+VERSION_KEY = 'posts:archive:version'
+COUNT_TIMEOUT = 60 * 60 * 24
+
+
+def archive_version():
+    return versioning.get(VERSION_KEY)
+
+
+def invalidate_counts():
+    """Помечает устаревшими закешированные размеры архивных лент."""
+    versioning.bump(VERSION_KEY)
+
+
+def count_key(feed):
+    return f'posts:archive:count:{archive_version()}:{feed}'
+
+
+def forget_count(feed):
+    cache.delete(count_key(feed))
+
+
+class ChainedFeed:
+    """Лента из оперативных постов, за которыми идут архивные.
+
+    Подходит для Paginator: архив читается, только если срез выходит
+    за последний оперативный пост, а его размер берётся из кеша.
+    """
+
+    def __init__(self, hot, cold, feed):
+        self.hot = hot
+        self.cold = cold
+        self.feed = feed
+        self._hot_count = None
+
+    @property
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self._hot_count
+
+    @property
+    def cold_count(self):
+        key = count_key(self.feed)
+        count = cache.get(key)
+        if count is None:
+            count = self.cold.count()
+            cache.set(key, count, COUNT_TIMEOUT)
+        return count
+
+    def filter(self, suffix, **lookups):
+        """Часть ленты; `suffix` отличает её размер в кеше."""
+        return ChainedFeed(
+            self.hot.filter(**lookups),
+            self.cold.filter(**lookups),
+            f'{self.feed}:{suffix}',
+        )
+
+    def count(self):
+        return self.hot_count + self.cold_count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        stop = item.stop
+        hot_count = self.hot_count
+        if stop is not None and stop <= hot_count:
+            return list(self.hot[start:stop])
+        posts = list(self.hot[start:hot_count]) if start < hot_count else []
+        cold_start = max(start - hot_count, 0)
+        cold_stop = None if stop is None else stop - hot_count
+        return posts + list(self.cold[cold_start:cold_stop])
+
+
+def get_post_or_404(post_id):
+    """Пост по id из оперативной таблицы или из архива."""
+    post = Post.objects.select_related('author').filter(pk=post_id).first()
+    if post is None:
+        post = ArchivedPost.objects.select_related('author').filter(
+            pk=post_id
+        ).first()
+    if post is None:
+        raise Http404('Пост не найден.')
+    return post
+
+
+def archive_batch(cutoff, batch_size):
+    """Переносит в архив до `batch_size` самых старых постов и
+    возвращает их число."""
+    with transaction.atomic():
+        posts = list(
+            Post.objects.filter(pub_date__lt=cutoff).order_by(
+                'pub_date', 'pk'
+            )[:batch_size]
+        )
+        if not posts:
+            return 0
+        ids = [post.pk for post in posts]
+        comments = Comment.objects.filter(post_id__in=ids)
+        ArchivedPost.objects.bulk_create([
+            ArchivedPost(
+                id=post.pk,
+                text=post.text,
+                image=post.image.name,
+                pub_date=post.pub_date,
+                author_id=post.author_id,
+                group_id=post.group_id,
+                **{field: getattr(post, field) for field in RENDERED_FIELDS},
+            )
+            for post in posts
+        ])
+        ArchivedComment.objects.bulk_create([
+            ArchivedComment(
+                id=comment.pk,
+                text=comment.text,
+                created=comment.created,
+                post_id=comment.post_id,
+                author_id=comment.author_id,
+            )
+            for comment in comments
+        ])
+        comments.delete()
+        Post.objects.filter(pk__in=ids).delete()
+        for group_id in {post.group_id for post in posts}:
+            group_stats.refresh(group_id)
+    return len(posts)
+
+
+def archive(days=None, batch_size=None):
+    """Переносит в архив все посты старше `days` дней."""
+    if days is None:
+        days = settings.POST_ARCHIVE_AFTER_DAYS
+    if batch_size is None:
+        batch_size = settings.POST_ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=days)
+    total = 0
+    while True:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            return total
+        invalidate_counts()
+        total += moved
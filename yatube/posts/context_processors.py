@@ -0,0 +1,11 @@
+from . import unread
+
+
+def unread_posts(request):
+    """Добавляет число новых постов авторов из подписки."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {
+        'unread_posts': unread.count(user.pk)
+    }
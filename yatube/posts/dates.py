@@ -0,0 +1,89 @@
+"""Архив лент по датам.
+
+Страница за год, месяц или день выбирает посты диапазоном по индексу
+на pub_date, поэтому глубина истории не влияет на стоимость запроса,
+в отличие от ?page=N с большим смещением.
+
+Число постов по месяцам для навигации считается одним запросом
+с группировкой и хранится в кеше. Прошлые месяцы не меняются при
+новых постах, поэтому в кеше лежат только они, а текущий месяц
+досчитывается запросом по индексу.
+"""
+import datetime
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.http import Http404
+from django.utils import timezone
+
+MONTHS_TIMEOUT = 60 * 60 * 24 * 31
+
+
+def period_bounds(year, month=None, day=None):
+    """Начало и конец периода в текущем часовом поясе."""
+    try:
+        if day is not None:
+            start = datetime.datetime(year, month, day)
+            end = start + datetime.timedelta(days=1)
+        elif month is not None:
+            start = datetime.datetime(year, month, 1)
+            end = next_month(start)
+        else:
+            start = datetime.datetime(year, 1, 1)
+            end = datetime.datetime(year + 1, 1, 1)
+    except (ValueError, OverflowError):
+        raise Http404('Неверная дата.')
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def next_month(moment):
+    if moment.month == 12:
+        return moment.replace(year=moment.year + 1, month=1)
+    return moment.replace(month=moment.month + 1)
+
+
+def current_month_start():
+    now = timezone.localtime()
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def months_key(feed, month_start):
+    return f'posts:months:{feed}:{month_start:%Y%m}'
+
+
+def forget_months(*feeds):
+    month_start = current_month_start()
+    cache.delete_many([months_key(feed, month_start) for feed in feeds])
+
+
+def _count_by_month(queryset):
+    rows = queryset.order_by().annotate(
+        month=TruncMonth('pub_date')
+    ).values('month').annotate(count=Count('pk')).values_list(
+        'month', 'count'
+    )
+    return Counter({month.date(): count for month, count in rows})
+
+
+def month_counts(feed):
+    """Месяцы ленты с постами и число постов в них, новые первыми.
+
+    `feed` — archive.ChainedFeed: учитываются и оперативные,
+    и архивные посты.
+    """
+    month_start = current_month_start()
+    key = months_key(feed.feed, month_start)
+    closed = cache.get(key)
+    if closed is None:
+        closed = _count_by_month(feed.hot.filter(pub_date__lt=month_start))
+        closed.update(
+            _count_by_month(feed.cold.filter(pub_date__lt=month_start))
+        )
+        cache.set(key, closed, MONTHS_TIMEOUT)
+    counts = Counter(closed)
+    current = feed.hot.filter(pub_date__gte=month_start).count()
+    if current:
+        counts[month_start.date()] = current
+    return sorted(counts.items(), reverse=True)
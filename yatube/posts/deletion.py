@@ -0,0 +1,138 @@
+"""Удаление пользователей и групп по частям.
+
+Пользователь при удалении каскадом уносит посты, комментарии
+и подписки, а Django собирает все связанные объекты в памяти и удаляет
+их одной долгой транзакцией. Группа обнуляет ссылку во всех своих
+постах одним большим UPDATE. Поэтому админка и команда не удаляют
+объект сразу, а ставят его в очередь DeletionTask. Команда
+process_deletions удаляет зависимые строки пачками по
+DELETION_BATCH_SIZE, каждую в своей короткой транзакции, а в конце
+удаляет сам объект. Картинки удалённых постов и их миниатюры убираются
+из хранилища после фиксации пачки.
+
+Прерванное удаление продолжается при следующем запуске команды с того
+места, где остановилось.
+"""
+import logging
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from sorl.thumbnail import delete as delete_image
+
+from .models import (
+    ArchivedComment, ArchivedPost, Comment, DeletionTask, Follow,
+    FollowSuggestion, Group, Post
+)
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def enqueue(obj):
+    """Ставит пользователя или группу в очередь на удаление.
+
+    Пользователь сразу теряет возможность войти на сайт.
+    """
+    if isinstance(obj, Group):
+        kind = DeletionTask.GROUP
+    else:
+        kind = DeletionTask.USER
+        if obj.is_active:
+            obj.is_active = False
+            obj.save(update_fields=['is_active'])
+    DeletionTask.objects.get_or_create(kind=kind, object_id=obj.pk)
+
+
+def _next_batch(queryset, batch_size):
+    return list(
+        queryset.order_by('pk').values_list('pk', flat=True)[:batch_size]
+    )
+
+
+def delete_images(names):
+    for name in names:
+        try:
+            delete_image(name)
+        except OSError:
+            logger.exception('Не удалось удалить картинку %s', name)
+
+
+def delete_rows(queryset, batch_size):
+    """Удаляет строки пачками и возвращает их число."""
+    model = queryset.model
+    deleted = 0
+    while True:
+        pks = _next_batch(queryset, batch_size)
+        if not pks:
+            return deleted
+        batch = model.objects.filter(pk__in=pks)
+        images = []
+        if issubclass(model, (Post, ArchivedPost)):
+            images = list(
+                batch.exclude(image='').values_list('image', flat=True)
+            )
+        with transaction.atomic():
+            batch.delete()
+            if images:
+                # Если пачка откатится, картинки её постов останутся.
+                transaction.on_commit(partial(delete_images, images))
+        deleted += len(pks)
+
+
+def detach_group(queryset, batch_size):
+    """Убирает группу у постов пачками и возвращает их число."""
+    detached = 0
+    while True:
+        pks = _next_batch(queryset, batch_size)
+        if not pks:
+            return detached
+        queryset.model.objects.filter(pk__in=pks).update(group=None)
+        detached += len(pks)
+
+
+def user_dependents(user_id):
+    """Зависимые строки пользователя в порядке удаления: комментарии
+    раньше постов, чтобы каскад от пачки постов был небольшим."""
+    return (
+        Comment.objects.filter(author_id=user_id),
+        Comment.objects.filter(post__author_id=user_id),
+        ArchivedComment.objects.filter(author_id=user_id),
+        ArchivedComment.objects.filter(post__author_id=user_id),
+        Follow.objects.filter(user_id=user_id),
+        Follow.objects.filter(author_id=user_id),
+        FollowSuggestion.objects.filter(user_id=user_id),
+        FollowSuggestion.objects.filter(author_id=user_id),
+        Post.objects.filter(author_id=user_id),
+        ArchivedPost.objects.filter(author_id=user_id),
+    )
+
+
+def process(task, batch_size=None):
+    """Удаляет объект задачи со всеми зависимыми строками."""
+    if batch_size is None:
+        batch_size = settings.DELETION_BATCH_SIZE
+    if task.kind == DeletionTask.USER:
+        for queryset in user_dependents(task.object_id):
+            delete_rows(queryset, batch_size)
+        target = User.objects.filter(pk=task.object_id)
+    else:
+        for model in (Post, ArchivedPost):
+            detach_group(
+                model.objects.filter(group_id=task.object_id), batch_size
+            )
+        target = Group.objects.filter(pk=task.object_id)
+    with transaction.atomic():
+        target.delete()
+        task.delete()
+
+
+def process_all(batch_size=None):
+    """Выполняет все задачи из очереди и возвращает их число."""
+    processed = 0
+    for task in DeletionTask.objects.order_by('pk'):
+        process(task, batch_size)
+        processed += 1
+    return processed
@@ -1,5 +1,6 @@
 from django import forms
 
+from . import registry
 from .models import Comment, Post
 
 
@@ -8,6 +9,14 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Список групп берём из реестра, а не из запроса к БД.
+        group_field = self.fields['group']
+        group_field.choices = (
+            [('', group_field.empty_label)] + registry.group_choices()
+        )
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,117 @@
+"""Денормализованная статистика групп для каталога групп.
+
+Счётчики меняются точечными UPDATE при создании и удалении поста;
+полный пересчёт группы нужен, только когда пост переносят между
+группами, удаляют последний пост группы или переносят посты в архив.
+Архивные посты тоже входят в счётчик. Команда rebuild_group_stats
+пересчитывает все группы разом.
+"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import registry
+from .models import ArchivedPost, Group, GroupStats, Post
+
+
+def latest_post(group_id):
+    return Post.objects.filter(group_id=group_id).order_by(
+        '-pub_date', '-pk'
+    ).first()
+
+
+def refresh(group_id):
+    """Пересчитывает статистику одной группы."""
+    if group_id is None:
+        return
+    post = latest_post(group_id)
+    archived = ArchivedPost.objects.filter(group_id=group_id)
+    if post is not None:
+        last_post_at = post.pub_date
+    else:
+        last_post_at = archived.aggregate(last=Max('pub_date'))['last']
+    GroupStats.objects.update_or_create(group_id=group_id, defaults={
+        'post_count': (
+            Post.objects.filter(group_id=group_id).count() + archived.count()
+        ),
+        'last_post_at': last_post_at,
+        'latest_post': post,
+    })
+
+
+def post_created(post):
+    if post.group_id is None:
+        return
+    updated = GroupStats.objects.filter(group_id=post.group_id).update(
+        post_count=F('post_count') + 1,
+        last_post_at=post.pub_date,
+        latest_post=post,
+    )
+    if not updated:
+        refresh(post.group_id)
+
+
+def post_deleted(post):
+    if post.group_id is None:
+        return
+    GroupStats.objects.filter(
+        group_id=post.group_id, post_count__gt=0
+    ).update(post_count=F('post_count') - 1)
+    # Ссылку на удалённый пост БД уже обнулила (SET_NULL).
+    if GroupStats.objects.filter(
+        group_id=post.group_id, latest_post__isnull=True
+    ).exists():
+        refresh(post.group_id)
+
+
+def rebuild():
+    """Пересчитывает статистику всех групп и возвращает их число."""
+    latest = Post.objects.filter(group=OuterRef('pk')).order_by(
+        '-pub_date', '-pk'
+    )
+    archived = ArchivedPost.objects.filter(group=OuterRef('pk')).order_by()
+    groups = Group.objects.annotate(
+        post_count=Count('posts'),
+        last_post_at=Max('posts__pub_date'),
+        latest_post_id=Subquery(latest.values('pk')[:1]),
+        archived_count=Coalesce(Subquery(
+            archived.values('group').annotate(count=Count('pk'))
+            .values('count'),
+            output_field=IntegerField(),
+        ), 0),
+        archived_last=Subquery(
+            archived.order_by('-pub_date').values('pub_date')[:1]
+        ),
+    ).values_list(
+        'pk', 'post_count', 'last_post_at', 'latest_post_id',
+        'archived_count', 'archived_last',
+    )
+    stats = [
+        GroupStats(
+            group_id=pk,
+            post_count=post_count + archived_count,
+            last_post_at=last_post_at or archived_last,
+            latest_post_id=latest_post_id,
+        )
+        for (pk, post_count, last_post_at, latest_post_id,
+             archived_count, archived_last) in groups
+    ]
+    with transaction.atomic():
+        GroupStats.objects.all().delete()
+        GroupStats.objects.bulk_create(stats)
+    return len(stats)
+
+
+def directory():
+    """Группы со статистикой для каталога: группы берутся из реестра,
+    статистика — одним запросом."""
+    stats = {
+        item.group_id: item
+        for item in GroupStats.objects.select_related('latest_post').only(
+            'post_count', 'last_post_at', 'latest_post',
+            'latest_post__preview_html',
+        )
+    }
+    return [
+        (group, stats.get(group.pk)) for group in registry.all_groups()
+    ]
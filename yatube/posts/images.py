@@ -0,0 +1,136 @@
+"""Адаптивные варианты картинок постов.
+
+Для каждой картинки sorl-thumbnail создаёт миниатюры нескольких
+ширин в современных форматах. Браузер выбирает формат по `type`
+в `<picture>` и ширину по `srcset`/`sizes`, поэтому телефон получает
+узкую WebP/AVIF-картинку, а не JPEG шириной 960 пикселей.
+"""
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+from PIL import Image, features
+from sorl.thumbnail import base, default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+EXTENSIONS = dict(base.EXTENSIONS, AVIF='avif')
+# Формат для браузеров без поддержки современных форматов.
+FALLBACK_FORMAT = 'JPEG'
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, умеющий сохранять миниатюры в AVIF
+    и заранее вычислять имя миниатюры."""
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        key = tokey(source.key, geometry_string, serialize(options))
+        path = f'{key[:2]}/{key[2:4]}/{key}'
+        extension = EXTENSIONS[options['format']]
+        return f'{sorl_settings.THUMBNAIL_PREFIX}{path}.{extension}'
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Миниатюра, которую вернёт get_thumbnail() с теми же
+        аргументами, но без обращения к хранилищу ключей."""
+        source = ImageFile(file_)
+        # Опции дополняются так же, как в base.ThumbnailBackend.
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+@lru_cache(maxsize=None)
+def modern_formats():
+    """Современные форматы, которые умеет сохранять установленный Pillow."""
+    Image.init()
+    formats = []
+    if 'AVIF' in Image.SAVE:
+        formats.append('AVIF')
+    if features.check('webp'):
+        formats.append('WEBP')
+    return tuple(
+        fmt for fmt in formats if fmt in settings.POST_IMAGE_FORMATS
+    )
+
+
+def geometry(width):
+    ratio_width, ratio_height = settings.POST_IMAGE_RATIO
+    return f'{width}x{round(width * ratio_height / ratio_width)}'
+
+
+def thumbnail_options(fmt):
+    return {'crop': 'center', 'upscale': True, 'format': fmt}
+
+
+def variant_specs():
+    """Геометрия и формат всех миниатюр одной картинки."""
+    for fmt in modern_formats() + (FALLBACK_FORMAT,):
+        for width in settings.POST_IMAGE_WIDTHS:
+            yield geometry(width), fmt
+
+
+def thumbnail_url(image, width, fmt):
+    return get_thumbnail(image, geometry(width), **thumbnail_options(fmt)).url
+
+
+def srcset(image, fmt):
+    return ', '.join(
+        f'{thumbnail_url(image, width, fmt)} {width}w'
+        for width in settings.POST_IMAGE_WIDTHS
+    )
+
+
+def prefetch_thumbnails(images):
+    """Загружает записи о миниатюрах всех картинок одним запросом,
+    если хранилище ключей это умеет."""
+    prefetch = getattr(default.kvstore, 'prefetch', None)
+    thumbnail_file = getattr(default.backend, 'thumbnail_file', None)
+    if prefetch is None or thumbnail_file is None:
+        return
+    try:
+        prefetch([
+            thumbnail_file(image, geometry_string, **thumbnail_options(fmt))
+            for image in images if image
+            for geometry_string, fmt in variant_specs()
+        ])
+    except Exception:
+        logger.exception('Не удалось загрузить записи о миниатюрах')
+
+
+def image_variants(image):
+    """Данные для разметки `<picture>` картинки поста.
+
+    Возвращает None, если картинки нет или миниатюры создать не удалось.
+    """
+    if not image:
+        return None
+    try:
+        largest = max(settings.POST_IMAGE_WIDTHS)
+        return {
+            'sources': [
+                {'type': MIME_TYPES[fmt], 'srcset': srcset(image, fmt)}
+                for fmt in modern_formats()
+            ],
+            'src': thumbnail_url(image, largest, FALLBACK_FORMAT),
+            'srcset': srcset(image, FALLBACK_FORMAT),
+            'sizes': settings.POST_IMAGE_SIZES,
+        }
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', image)
+        return None
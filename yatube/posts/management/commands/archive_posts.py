@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import archive
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые посты и их комментарии в архивные таблицы.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.POST_ARCHIVE_AFTER_DAYS,
+            help='Посты старше этого числа дней переносятся в архив.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.POST_ARCHIVE_BATCH_SIZE,
+            help='Сколько постов переносить одной транзакцией.'
+        )
+
+    def handle(self, *args, **options):
+        moved = archive.archive(options['days'], options['batch_size'])
+        self.stdout.write(f'Перенесено в архив постов: {moved}')
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = 'Уменьшает рейтинги популярных постов со временем.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            default=settings.TRENDING_DECAY_INTERVAL,
+            help='Сколько секунд прошло с прошлого запуска команды.'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, а уменьшать рейтинги каждые --interval '
+                 'секунд.'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            started = time.monotonic()
+            deleted = trending.decay(interval)
+            if deleted:
+                self.stdout.write(f'Остывших постов удалено: {deleted}')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+            # Затухание считается по времени, которое прошло на самом деле.
+            interval = time.monotonic() - started
@@ -0,0 +1,73 @@
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Post
+from posts.rendering import cards
+from posts.views import AMOUNT_POSTS
+
+
+def bytes_read(queryset):
+    """Сколько байт данных вернула БД на запрос (без служебных полей
+    протокола): значения всех столбцов всех строк."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return sum(
+        len(value if isinstance(value, bytes) else str(value).encode())
+        for row in rows for value in row if value is not None
+    )
+
+
+def allocated(queryset):
+    """Сколько памяти занимают объекты, построенные по строкам запроса."""
+    queryset = queryset.all()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        posts = list(queryset)
+        # Обращение к автору: без select_related здесь был бы запрос.
+        for post in posts:
+            post.author.get_full_name()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return size, len(posts)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает запрос страницы ленты: все столбцы поста и автора '
+        'против только тех, что нужны карточке поста.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=AMOUNT_POSTS,
+            help='Сколько последних постов взять.'
+        )
+
+    def handle(self, *args, **options):
+        limit = options['posts']
+        variants = {
+            'full': Post.objects.select_related('author')[:limit],
+            'lean': cards(Post.objects.all())[:limit],
+        }
+        results = {}
+        for name, queryset in variants.items():
+            size, rows = allocated(queryset)
+            results[name] = (bytes_read(queryset), size, rows)
+        if not results['full'][2]:
+            self.stdout.write('Нет постов.')
+            return
+        full_bytes, full_size, rows = results['full']
+        self.stdout.write(f'Постов на странице: {rows}')
+        for name, (read, size, rows) in results.items():
+            self.stdout.write(
+                f'{name:>4}: {read:>8} байт из БД '
+                f'(экономия {100 * (1 - read / full_bytes):.1f}%), '
+                f'{size // rows:>6} байт памяти на строку '
+                f'(экономия {100 * (1 - size / full_size):.1f}%)'
+            )
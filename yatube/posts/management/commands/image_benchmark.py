@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import get_thumbnail
+
+from posts.images import FALLBACK_FORMAT, geometry, modern_formats
+from posts.models import Post
+from posts.views import AMOUNT_POSTS
+
+LEGACY_GEOMETRY = '960x339'
+
+
+def thumbnail_size(image, geometry_string, fmt):
+    thumbnail = get_thumbnail(
+        image, geometry_string, crop='center', upscale=True, format=fmt,
+    )
+    return thumbnail.storage.size(thumbnail.name)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает объём картинок страницы ленты: одна JPEG-миниатюра '
+        '960x339 против адаптивных вариантов для телефона и компьютера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=AMOUNT_POSTS,
+            help='Сколько последних постов с картинками взять.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')[:options['posts']]
+        best = (modern_formats() or (FALLBACK_FORMAT,))[0]
+        smallest = min(settings.POST_IMAGE_WIDTHS)
+        largest = max(settings.POST_IMAGE_WIDTHS)
+        totals = {'legacy': 0, 'desktop': 0, 'mobile': 0}
+        for post in posts:
+            totals['legacy'] += thumbnail_size(
+                post.image, LEGACY_GEOMETRY, FALLBACK_FORMAT
+            )
+            totals['desktop'] += thumbnail_size(
+                post.image, geometry(largest), best
+            )
+            totals['mobile'] += thumbnail_size(
+                post.image, geometry(smallest), best
+            )
+        if not totals['legacy']:
+            self.stdout.write('Нет постов с картинками.')
+            return
+        self.stdout.write(
+            f'Постов с картинками: {len(posts)}, формат вариантов: {best}'
+        )
+        for client in ('legacy', 'desktop', 'mobile'):
+            saved = 100 * (1 - totals[client] / totals['legacy'])
+            self.stdout.write(
+                f'{client:>8}: {totals[client]:>10} байт '
+                f'(экономия {saved:.1f}%)'
+            )
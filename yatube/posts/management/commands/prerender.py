@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+
+from posts import prerender
+
+
+class Command(BaseCommand):
+    help = (
+        'Заранее отрисовывает самые посещаемые страницы для анонимных '
+        'посетителей и обновляет их после изменений.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, а обновлять страницы в цикле.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=settings.PRERENDER_INTERVAL,
+            help='Пауза в секундах между проверками.'
+        )
+        parser.add_argument(
+            '--hot-interval', type=float, default=60,
+            help='Как часто в секундах пересчитывать список страниц.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=settings.PRERENDER_HOT_PAGES,
+            help='Сколько страниц выбирать по числу обращений.'
+        )
+
+    def handle(self, *args, **options):
+        handler = WSGIHandler()
+        paths = []
+        chosen = 0.0
+        while True:
+            if time.time() - chosen >= options['hot_interval']:
+                paths = prerender.hot_paths(options['limit'])
+                chosen = time.time()
+            refreshed = prerender.refresh(paths, handler=handler)
+            if refreshed:
+                self.stdout.write(
+                    f'Обновлено страниц: {refreshed} из {len(paths)}'
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
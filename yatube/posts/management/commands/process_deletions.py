@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import deletion
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет пользователей и группы из очереди: зависимые строки '
+        'удаляются пачками в коротких транзакциях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.DELETION_BATCH_SIZE,
+            help='Сколько строк удалять в одной транзакции.'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, а проверять очередь каждые --interval '
+                 'секунд.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=60,
+            help='Пауза между проверками очереди в режиме --loop.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = deletion.process_all(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Удалено объектов: {processed}')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
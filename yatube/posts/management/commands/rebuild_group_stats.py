@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import group_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает статистику всех групп, например после массовых '
+        'изменений постов в обход сигналов.'
+    )
+
+    def handle(self, *args, **options):
+        count = group_stats.rebuild()
+        self.stdout.write(f'Пересчитано групп: {count}')
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «на кого подписаться» по графу '
+        'подписок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=settings.FOLLOW_SUGGESTIONS_SIZE,
+            help='Сколько авторов рекомендовать каждому пользователю.'
+        )
+
+    def handle(self, *args, **options):
+        count = suggestions.rebuild(options['limit'])
+        self.stdout.write(f'Записано рекомендаций: {count}')
@@ -0,0 +1,74 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import ArchivedPost, Post
+from posts.rendering import RENDERED_FIELDS, render_rows
+
+
+def batches(model, batch_size):
+    """Пары (id, текст) пачками по возрастанию id без OFFSET."""
+    last_pk = 0
+    while True:
+        rows = list(
+            model.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', 'text'
+            )[:batch_size]
+        )
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново отрисовывает сохранённый HTML и начало текста всех постов, '
+        'например после изменения правил отрисовки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов отрисовывать и сохранять за раз.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов для отрисовки.'
+        )
+
+    def handle(self, *args, **options):
+        self.workers = options['workers']
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=django.setup
+        ) as executor:
+            for model in (Post, ArchivedPost):
+                total = self.render_model(
+                    executor, model, options['batch_size']
+                )
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}: {total}'
+                )
+
+    def render_model(self, executor, model, batch_size):
+        total = 0
+        # Пачек в работе не больше, чем нужно для загрузки процессов,
+        # чтобы не читать всю таблицу в память.
+        pending = deque()
+        for rows in batches(model, batch_size):
+            pending.append(executor.submit(render_rows, rows))
+            if len(pending) >= self.workers * 2:
+                total += self.save(model, pending.popleft().result())
+        while pending:
+            total += self.save(model, pending.popleft().result())
+        return total
+
+    def save(self, model, rendered):
+        objs = [model(pk=pk, **fields) for pk, fields in rendered]
+        with transaction.atomic():
+            model.objects.bulk_update(objs, RENDERED_FIELDS)
+        return len(objs)
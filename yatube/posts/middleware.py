@@ -0,0 +1,33 @@
+from core import surrogate
+from django.http import HttpResponse
+
+from . import prerender
+
+
+class PrerenderMiddleware:
+    """Отдаёт анонимным посетителям заранее отрисованные страницы
+    и считает обращения к страницам, которые можно отрисовать."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # Считаются только существующие страницы: поток запросов
+        # к несуществующим адресам не засоряет список горячих страниц.
+        if (
+            getattr(request, 'prerender_candidate', False)
+            and response.status_code == 200
+        ):
+            prerender.count_hit(request.path)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not prerender.is_candidate(request):
+            return None
+        request.prerender_candidate = True
+        page = prerender.get_page(request.path)
+        if page is None:
+            return None
+        surrogate.add_keys(request, *page.get('surrogate_keys', ()))
+        return HttpResponse(page['content'], page['content_type'])
@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:19
+
+from django.db import migrations, models
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+# Копии правил отрисовки на момент миграции: изменения posts.rendering
+# не должны менять её результат.
+EXCERPT_LENGTH = 30
+
+
+def render_text(text):
+    return linebreaksbr(text, autoescape=True)
+
+
+def make_excerpt(text):
+    return Truncator(text).chars(EXCERPT_LENGTH)
+
+
+def render_existing_posts(apps, schema_editor):
+    for model_name in ('Post', 'ArchivedPost'):
+        model = apps.get_model('posts', model_name)
+        batch = []
+        for post in model.objects.only('pk', 'text').iterator():
+            post.text_html = render_text(post.text)
+            post.excerpt = make_excerpt(post.text)
+            batch.append(post)
+            if len(batch) == 500:
+                model.objects.bulk_update(batch, ['text_html', 'excerpt'])
+                batch = []
+        model.objects.bulk_update(batch, ['text_html', 'excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_pub_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedpost',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=30, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='archivedpost',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=30, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML текста'),
+        ),
+        migrations.RunPython(render_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:20
+
+from django.db import migrations, models
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+PREVIEW_FIELDS = ('preview_html', 'truncated')
+# Копия правил превью на момент миграции: изменения posts.rendering
+# не должны менять её результат.
+PREVIEW_LENGTH = 500
+
+
+def rendered_fields(text):
+    preview = Truncator(text).chars(PREVIEW_LENGTH)
+    return {
+        'preview_html': linebreaksbr(preview, autoescape=True),
+        'truncated': len(text) > PREVIEW_LENGTH,
+    }
+
+
+def render_previews(apps, schema_editor):
+    for model_name in ('Post', 'ArchivedPost'):
+        model = apps.get_model('posts', model_name)
+        batch = []
+        for post in model.objects.only('pk', 'text').iterator():
+            fields = rendered_fields(post.text)
+            for field in PREVIEW_FIELDS:
+                setattr(post, field, fields[field])
+            batch.append(post)
+            if len(batch) == 500:
+                model.objects.bulk_update(batch, PREVIEW_FIELDS)
+                batch = []
+        model.objects.bulk_update(batch, PREVIEW_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_text_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedpost',
+            name='preview_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML превью'),
+        ),
+        migrations.AddField(
+            model_name='archivedpost',
+            name='truncated',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Превью короче текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='preview_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML превью'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='truncated',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Превью короче текста'),
+        ),
+        migrations.RunPython(render_previews, migrations.RunPython.noop),
+    ]
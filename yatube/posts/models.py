@@ -2,16 +2,64 @@ from core.models import CreatedModel
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .rendering import EXCERPT_LENGTH, RENDERED_FIELDS, render_post
+
 User = get_user_model()
 
 AMOUNT_LETTERS = 15
 
 
-class Post(CreatedModel):
+class BasePost(CreatedModel):
+    """Абстрактная модель. Общие поля оперативного и архивного поста."""
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Введите текст поста'
     )
+    image = models.ImageField(
+        'Картинка',
+        upload_to='posts/',
+        blank=True
+    )
+    text_html = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='HTML текста'
+    )
+    excerpt = models.CharField(
+        max_length=EXCERPT_LENGTH,
+        blank=True,
+        editable=False,
+        verbose_name='Начало текста'
+    )
+    preview_html = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='HTML превью'
+    )
+    truncated = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Превью короче текста'
+    )
+
+    class Meta:
+        abstract = True
+        ordering = ['-pub_date']
+
+    def __str__(self):
+        return self.text[:AMOUNT_LETTERS]
+
+    def save(self, *args, **kwargs):
+        render_post(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = (
+                set(update_fields) | set(RENDERED_FIELDS)
+            )
+        super().save(*args, **kwargs)
+
+
+class Post(BasePost):
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
@@ -27,20 +75,11 @@ class Post(CreatedModel):
         related_name='posts',
         help_text='Группа, к которой будет относиться пост'
     )
-    image = models.ImageField(
-        'Картинка',
-        upload_to='posts/',
-        blank=True
-    )
 
-    class Meta:
-        ordering = ['-pub_date']
+    class Meta(BasePost.Meta):
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
-    def __str__(self):
-        return self.text[:AMOUNT_LETTERS]
-
 
 class Group(models.Model):
     title = models.CharField(max_length=200,
@@ -57,7 +96,19 @@ class Group(models.Model):
         return self.title
 
 
-class Comment(models.Model):
+class BaseComment(models.Model):
+    """Абстрактная модель. Общие поля оперативного и архивного
+    комментария."""
+    text = models.TextField(
+        verbose_name='Текст комментария',
+        help_text='Введите текст комментария'
+    )
+
+    class Meta:
+        abstract = True
+
+
+class Comment(BaseComment):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -68,10 +119,6 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name='comments'
     )
-    text = models.TextField(
-        verbose_name='Текст комментария',
-        help_text='Введите текст комментария'
-    )
     created = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата комментария'
@@ -105,3 +152,198 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user}{self.author}'
+
+
+class FollowSuggestion(models.Model):
+    """Автор, на которого стоит подписаться пользователю.
+
+    Строки пересчитывает команда rebuild_suggestions по графу подписок:
+    это авторы, на которых подписаны авторы из подписок пользователя.
+    Чем у большего числа его авторов есть подписка, тем выше место.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    score = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Общих подписок'
+    )
+    rank = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Место'
+    )
+
+    class Meta:
+        verbose_name = 'Рекомендация подписки'
+        verbose_name_plural = 'Рекомендации подписок'
+        ordering = ('rank',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_suggestion'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.author_id}: {self.score}'
+
+
+class DeletionTask(models.Model):
+    """Пользователь или группа в очереди на удаление.
+
+    Зависимые строки удаляет по частям команда process_deletions,
+    а строка задачи удаляется вместе с самим объектом.
+    """
+    USER = 'user'
+    GROUP = 'group'
+    KIND_CHOICES = (
+        (USER, 'Пользователь'),
+        (GROUP, 'Группа'),
+    )
+    kind = models.CharField(
+        max_length=10,
+        choices=KIND_CHOICES,
+        verbose_name='Тип объекта'
+    )
+    object_id = models.PositiveIntegerField(
+        verbose_name='Id объекта'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата постановки в очередь'
+    )
+
+    class Meta:
+        verbose_name = 'Задача удаления'
+        verbose_name_plural = 'Задачи удаления'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('kind', 'object_id'), name='unique_deletion_task'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
+
+
+class TrendingScore(models.Model):
+    """Рейтинг поста по недавним комментариям.
+
+    Каждый комментарий добавляет к рейтингу единицу, а команда
+    decay_trending периодически уменьшает все рейтинги, поэтому старые
+    комментарии весят меньше новых.
+    """
+    post = models.OneToOneField(
+        Post,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='trending',
+        verbose_name='Пост'
+    )
+    score = models.FloatField(
+        default=0,
+        db_index=True,
+        verbose_name='Рейтинг'
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг поста'
+        verbose_name_plural = 'Рейтинги постов'
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.2f}'
+
+
+class GroupStats(models.Model):
+    """Число постов, последняя активность и последний пост группы.
+
+    Обновляется сигналами при создании и удалении постов и при переносе
+    поста в другую группу. Удалённая группа уносит свою строку с собой,
+    а её посты просто остаются без группы.
+    """
+    group = models.OneToOneField(
+        Group,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Группа'
+    )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число постов'
+    )
+    last_post_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Последняя активность'
+    )
+    latest_post = models.ForeignKey(
+        Post,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Последний пост'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика группы'
+        verbose_name_plural = 'Статистика групп'
+
+    def __str__(self):
+        return f'{self.group_id}: {self.post_count}'
+
+
+class ArchivedPost(BasePost):
+    """Пост старше POST_ARCHIVE_AFTER_DAYS, перенесённый командой
+    archive_posts. Сохраняет id и дату исходного поста."""
+    id = models.IntegerField(primary_key=True)
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+        db_index=True
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='archived_posts'
+    )
+    group = models.ForeignKey(
+        Group,
+        verbose_name='Группа',
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts'
+    )
+
+    class Meta(BasePost.Meta):
+        verbose_name = 'Архивный пост'
+        verbose_name_plural = 'Архивные посты'
+
+
+class ArchivedComment(BaseComment):
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments'
+    )
+    created = models.DateTimeField(verbose_name='Дата комментария')
+
+    class Meta:
+        verbose_name = 'Архивный комментарий'
+        verbose_name_plural = 'Архивные комментарии'
@@ -0,0 +1,173 @@
+"""Заранее отрисованные страницы для анонимных посетителей.
+
+Команда prerender в цикле отрисовывает самые посещаемые страницы
+(первые страницы ленты, групп и профилей) и кладёт готовый HTML в кеш
+вместе с поколением записей. Любое изменение постов, комментариев,
+групп или пользователей увеличивает поколение, и PrerenderMiddleware
+перестаёт отдавать устаревшие страницы, пока команда их не обновит.
+
+Какие страницы горячие, задаёт PRERENDER_PAGES; ещё PRERENDER_HOT_PAGES
+страниц выбирается по обращениям анонимных посетителей. Процесс копит
+обращения в памяти и раз в PRERENDER_HITS_FLUSH_INTERVAL секунд
+добавляет их к общему списку горячих адресов в кеше. Список ограничен
+по длине, поэтому его размер не зависит от числа пользователей и групп.
+"""
+import io
+import threading
+import time
+from collections import Counter
+
+from core import versioning
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler, WSGIRequest
+
+GENERATION_KEY = 'posts:prerender:generation'
+HOT_KEY = 'posts:prerender:hot'
+# Представления, страницы которых можно отрисовать заранее.
+PRERENDER_VIEWS = ('posts:index', 'posts:group_list', 'posts:profile')
+# Заголовок запросов самой команды: им нельзя отдавать готовую страницу.
+PRERENDER_HEADER = 'HTTP_X_YATUBE_PRERENDER'
+# Во сколько раз больше адресов, чем PRERENDER_HOT_PAGES, хранит список
+# горячих страниц: запас нужен, чтобы новые страницы успели набрать
+# обращения.
+HOT_CAPACITY_FACTOR = 4
+
+_lock = threading.Lock()
+_pending = {'hits': Counter(), 'flushed': time.monotonic()}
+
+
+def page_key(path):
+    return f'posts:prerender:page:{path}'
+
+
+def current_generation():
+    return versioning.get(GENERATION_KEY)
+
+
+def bump_generation():
+    """Помечает все готовые страницы устаревшими."""
+    versioning.bump(GENERATION_KEY)
+
+
+def is_candidate(request):
+    """Можно ли ответить на запрос заранее отрисованной страницей."""
+    match = request.resolver_match
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.GET
+        and match is not None
+        and match.view_name in PRERENDER_VIEWS
+        and PRERENDER_HEADER not in request.META
+        and 'messages' not in request.COOKIES
+        and not request.user.is_authenticated
+    )
+
+
+def count_hit(path):
+    """Учитывает успешный ответ анонимному посетителю."""
+    with _lock:
+        _pending['hits'][path] += 1
+        now = time.monotonic()
+        interval = settings.PRERENDER_HITS_FLUSH_INTERVAL
+        if now - _pending['flushed'] < interval:
+            return
+        hits = _pending['hits']
+        _pending.update(hits=Counter(), flushed=now)
+    flush_hits(hits)
+
+
+def flush_hits(hits):
+    """Добавляет обращения процесса к общему списку горячих адресов.
+
+    Одновременный сброс из двух процессов может потерять часть
+    обращений одного из них: для выбора горячих страниц это неважно.
+    """
+    hot = cache.get(HOT_KEY) or {'counts': {}, 'window': time.time()}
+    counts = Counter(hot['counts'])
+    if time.time() - hot['window'] >= settings.PRERENDER_HITS_TIMEOUT:
+        # Обращения прошлых периодов весят вдвое меньше новых.
+        counts = Counter({
+            path: count // 2 for path, count in counts.items() if count > 1
+        })
+        hot['window'] = time.time()
+    counts.update(hits)
+    capacity = settings.PRERENDER_HOT_PAGES * HOT_CAPACITY_FACTOR
+    hot['counts'] = dict(counts.most_common(capacity))
+    cache.set(HOT_KEY, hot, None)
+
+
+def get_page(path):
+    """Готовая страница или None, если её нет или она устарела."""
+    entry = cache.get(page_key(path))
+    if entry is None or entry['generation'] != current_generation():
+        return None
+    return entry
+
+
+def _request(path):
+    return WSGIRequest({
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': settings.PRERENDER_HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        PRERENDER_HEADER: '1',
+    })
+
+
+def render_page(handler, path, generation):
+    """Отрисовывает страницу от имени анонимного посетителя через все
+    middleware и сохраняет её, если ответ можно отдавать всем."""
+    # Ответ не закрывается: request_finished закрыл бы соединение с БД
+    # посреди работы команды.
+    response = handler.get_response(_request(path))
+    if response.status_code != 200 or response.streaming or response.cookies:
+        cache.delete(page_key(path))
+        return False
+    cache.set(page_key(path), {
+        'generation': generation,
+        'rendered': time.time(),
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'surrogate_keys': response.get('Surrogate-Key', '').split(),
+    }, settings.PRERENDER_TIMEOUT)
+    return True
+
+
+def hot_paths(limit=None):
+    """PRERENDER_PAGES и самые посещаемые страницы."""
+    if limit is None:
+        limit = settings.PRERENDER_HOT_PAGES
+    hot = cache.get(HOT_KEY) or {'counts': {}}
+    learned = [
+        path for path, _ in Counter(hot['counts']).most_common(limit)
+    ]
+    paths = list(settings.PRERENDER_PAGES)
+    paths.extend(path for path in learned if path not in paths)
+    return paths
+
+
+def refresh(paths, max_age=None, handler=None):
+    """Перерисовывает устаревшие страницы и возвращает их число."""
+    if max_age is None:
+        max_age = settings.PRERENDER_MAX_AGE
+    handler = handler or WSGIHandler()
+    generation = current_generation()
+    now = time.time()
+    refreshed = 0
+    for path in paths:
+        entry = cache.get(page_key(path))
+        if (
+            entry is not None
+            and entry['generation'] == generation
+            and now - entry['rendered'] < max_age
+        ):
+            continue
+        if render_page(handler, path, generation):
+            refreshed += 1
+    return refreshed
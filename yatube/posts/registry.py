@@ -0,0 +1,63 @@
+"""Реестр групп в памяти процесса.
+
+Групп немного, и меняются они редко, поэтому все группы читаются
+из БД одним запросом и хранятся в процессе. После фиксации
+изменения группы версия реестра в общем кеше увеличивается, и все
+процессы перечитывают группы при следующем обращении.
+"""
+import threading
+
+from core import versioning
+
+from .models import Group
+
+VERSION_KEY = 'posts:groups:version'
+
+_lock = threading.Lock()
+_state = {'version': None, 'groups': None}
+
+
+def _load():
+    version = versioning.get(VERSION_KEY)
+    groups = _state['groups']
+    if groups is not None and _state['version'] == version:
+        return groups
+    with _lock:
+        items = list(Group.objects.order_by('title'))
+        groups = {
+            'list': items,
+            'by_id': {group.pk: group for group in items},
+            'by_slug': {group.slug: group for group in items},
+        }
+        _state.update(version=version, groups=groups)
+    return groups
+
+
+def forget():
+    """Помечает реестр устаревшим в текущем процессе."""
+    _state['groups'] = None
+
+
+def invalidate():
+    """Помечает реестр устаревшим во всех процессах."""
+    versioning.bump(VERSION_KEY)
+    forget()
+
+
+def all_groups():
+    return _load()['list']
+
+
+def get_group(group_id):
+    if group_id is None:
+        return None
+    return _load()['by_id'].get(group_id)
+
+
+def get_group_by_slug(slug):
+    return _load()['by_slug'].get(slug)
+
+
+def group_choices():
+    """Варианты выбора группы для формы поста."""
+    return [(group.pk, str(group)) for group in all_groups()]
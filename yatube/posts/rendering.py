@@ -0,0 +1,63 @@
+"""Отрисовка текста поста при сохранении.
+
+HTML текста, начало для заголовка и ограниченное по длине превью для
+лент считаются один раз в Post.save() и хранятся в модели, а шаблоны
+выводят готовые поля. Если правила отрисовки поменяются, команда
+render_posts пересчитает сохранённые поля всех постов.
+"""
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+# Длина начала текста для заголовка страницы поста.
+EXCERPT_LENGTH = 30
+# Длина превью в лентах: ограничивает размер страницы ленты.
+PREVIEW_LENGTH = 500
+RENDERED_FIELDS = ('text_html', 'excerpt', 'preview_html', 'truncated')
+# Поля поста и автора, которых хватает карточке поста в лентах: полный
+# текст, почту, хеш пароля и остальные столбцы ленты не читают.
+CARD_FIELDS = (
+    'pub_date', 'image', 'preview_html', 'truncated', 'group', 'author',
+)
+AUTHOR_CARD_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def card_fields(prefix=''):
+    """Поля для only(); prefix — путь к посту от связанной модели."""
+    fields = CARD_FIELDS + tuple(
+        f'author__{field}' for field in AUTHOR_CARD_FIELDS
+    )
+    return [prefix + field for field in fields]
+
+
+def cards(queryset):
+    """Посты для карточек ленты вместе с авторами одним запросом."""
+    return queryset.select_related('author').only(*card_fields())
+
+
+def render_text(text):
+    """Экранированный текст с <br> вместо переносов строк."""
+    return linebreaksbr(text, autoescape=True)
+
+
+def make_excerpt(text):
+    return Truncator(text).chars(EXCERPT_LENGTH)
+
+
+def rendered_fields(text):
+    """Значения всех отрисованных полей для текста поста."""
+    return {
+        'text_html': render_text(text),
+        'excerpt': make_excerpt(text),
+        'preview_html': render_text(Truncator(text).chars(PREVIEW_LENGTH)),
+        'truncated': len(text) > PREVIEW_LENGTH,
+    }
+
+
+def render_post(post):
+    for field, value in rendered_fields(post.text).items():
+        setattr(post, field, value)
+
+
+def render_rows(rows):
+    """Отрисовывает пары (id, текст); выполняется в дочерних процессах."""
+    return [(pk, rendered_fields(text)) for pk, text in rows]
@@ -0,0 +1,161 @@
+from core import surrogate
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    archive, dates, group_stats, prerender, registry, suggestions, surrogates,
+    unread,
+)
+from .models import (
+    ArchivedPost, Comment, Follow, Group, GroupStats, Post
+)
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_registry(sender, **kwargs):
+    # Свой процесс видит изменение сразу. Версию увеличиваем только
+    # после фиксации: иначе другой процесс прочитал бы новую версию
+    # вместе со старыми строками и держал бы их до следующего изменения.
+    registry.forget()
+    transaction.on_commit(registry.invalidate)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=ArchivedPost)
+@receiver(post_delete, sender=User)
+def expire_prerendered_pages(sender, **kwargs):
+    prerender.bump_generation()
+
+
+@receiver(post_save, sender=User)
+def expire_prerendered_pages_on_user_change(sender, update_fields=None,
+                                            **kwargs):
+    # Вход пользователя меняет только last_login, страниц это не касается.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    prerender.bump_generation()
+
+
+@receiver(post_save, sender=Group)
+def create_group_stats(sender, instance, created, **kwargs):
+    if created:
+        GroupStats.objects.get_or_create(group=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, update_fields=None, **kwargs):
+    """Запоминает прежнюю группу поста, чтобы заметить перенос."""
+    if instance.pk is None:
+        return
+    if update_fields is not None and 'group' not in update_fields:
+        return
+    instance._old_group_id = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def update_group_stats(sender, instance, created, **kwargs):
+    if created:
+        group_stats.post_created(instance)
+        return
+    old_group_id = getattr(instance, '_old_group_id', instance.group_id)
+    if old_group_id != instance.group_id:
+        group_stats.refresh(old_group_id)
+        group_stats.refresh(instance.group_id)
+        dates.forget_months(
+            f'group:{old_group_id}', f'group:{instance.group_id}'
+        )
+
+
+@receiver(post_delete, sender=Post)
+def update_group_stats_on_delete(sender, instance, **kwargs):
+    group_stats.post_deleted(instance)
+
+
+@receiver(post_delete, sender=ArchivedPost)
+def update_archive_on_delete(sender, instance, **kwargs):
+    group_stats.refresh(instance.group_id)
+    archive.invalidate_counts()
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def forget_follow_archive_count(sender, instance, **kwargs):
+    archive.forget_count(f'follow:{instance.user_id}')
+
+
+@receiver(post_save, sender=Post)
+def count_unread_post(sender, instance, created, **kwargs):
+    if created:
+        author_id = instance.author_id
+        transaction.on_commit(lambda: unread.record_post(author_id))
+
+
+@receiver(post_save, sender=Follow)
+def add_unread_author(sender, instance, created, **kwargs):
+    if created:
+        unread.follow_changed(instance.user_id, instance.author_id, True)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_unread_author(sender, instance, **kwargs):
+    unread.follow_changed(instance.user_id, instance.author_id, False)
+
+
+@receiver(post_save, sender=Follow)
+def forget_followed_suggestion(sender, instance, created, **kwargs):
+    if created:
+        suggestions.forget(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def forget_month_counts(sender, instance, **kwargs):
+    """Новые посты попадают в текущий месяц, которого нет в кеше,
+    поэтому счётчики месяцев сбрасываются только при удалении."""
+    dates.forget_months(
+        'index', f'group:{instance.group_id}', f'author:{instance.author_id}'
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def purge_post(sender, instance, **kwargs):
+    surrogate.purge(
+        *surrogates.post_keys(instance),
+        surrogates.group_key(getattr(instance, '_old_group_id', None)),
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_commented_post(sender, instance, **kwargs):
+    surrogate.purge(
+        surrogates.post_key(instance.post_id), surrogates.TRENDING_KEY
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group(sender, instance, **kwargs):
+    surrogate.purge(surrogates.group_slug_key(instance.slug))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def purge_author(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    surrogate.purge(surrogates.author_key(instance.pk))
@@ -0,0 +1,130 @@
+"""Карта сайта для поисковых роботов.
+
+Каждый раздел (посты, профили, группы) делится на куски по диапазонам
+id: кусок номер n содержит объекты с id от n * SITEMAP_CHUNK_SIZE
+до (n + 1) * SITEMAP_CHUNK_SIZE. Кусок читается итератором по индексу
+первичного ключа без OFFSET и отдаётся потоком, поэтому память не
+зависит от числа постов.
+
+Новые объекты получают большие id, так что все куски, кроме последнего,
+почти не меняются: их готовый XML хранится в кеше.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Max
+from django.urls import reverse
+from django.utils.html import escape
+
+from .models import ArchivedPost, Group, Post
+
+User = get_user_model()
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+# Сколько строк читать из БД за раз.
+ITERATOR_CHUNK_SIZE = 2000
+
+
+def chunk_key(host, section, chunk):
+    return f'posts:sitemap:{host}:{section}:{chunk}'
+
+
+def cache_stream(parts, key):
+    """Отдаёт части как есть и после последней сохраняет их в кеше."""
+    buffer = []
+    for part in parts:
+        buffer.append(part)
+        yield part
+    cache.set(key, ''.join(buffer), settings.SITEMAP_CACHE_TIMEOUT)
+
+
+def max_id(*querysets):
+    ids = [
+        queryset.aggregate(max_id=Max('pk'))['max_id']
+        for queryset in querysets
+    ]
+    ids = [pk for pk in ids if pk is not None]
+    return max(ids) if ids else None
+
+
+def id_range(chunk):
+    size = settings.SITEMAP_CHUNK_SIZE
+    return {'pk__gte': chunk * size, 'pk__lt': (chunk + 1) * size}
+
+
+def post_entries(chunk):
+    """Адреса и даты постов куска: сначала архивных, затем оперативных."""
+    for model in (ArchivedPost, Post):
+        rows = model.objects.filter(**id_range(chunk)).order_by(
+            'pk'
+        ).values_list('pk', 'pub_date')
+        for pk, pub_date in rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            url = reverse('posts:post_detail', kwargs={'post_id': pk})
+            yield url, pub_date
+
+
+def profile_entries(chunk):
+    rows = User.objects.filter(**id_range(chunk)).order_by('pk').annotate(
+        lastmod=Max('posts__pub_date')
+    ).values_list('username', 'lastmod')
+    for username, lastmod in rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        url = reverse('posts:profile', kwargs={'username': username})
+        yield url, lastmod
+
+
+def group_entries(chunk):
+    rows = Group.objects.filter(**id_range(chunk)).order_by(
+        'pk'
+    ).values_list('slug', 'stats__last_post_at')
+    for slug, lastmod in rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield reverse('posts:group_list', kwargs={'slug': slug}), lastmod
+
+
+# Раздел: функция адресов куска и функция наибольшего id.
+SECTIONS = {
+    'posts': (
+        post_entries,
+        lambda: max_id(Post.objects.all(), ArchivedPost.objects.all()),
+    ),
+    'profiles': (profile_entries, lambda: max_id(User.objects.all())),
+    'groups': (group_entries, lambda: max_id(Group.objects.all())),
+}
+
+
+def chunk_count(section):
+    last_id = SECTIONS[section][1]()
+    if last_id is None:
+        return 0
+    return last_id // settings.SITEMAP_CHUNK_SIZE + 1
+
+
+def render_index(build_absolute_uri):
+    """XML индекса карты сайта по частям."""
+    yield XML_HEADER
+    yield f'<sitemapindex xmlns="{XMLNS}">\n'
+    for section in SECTIONS:
+        for chunk in range(chunk_count(section)):
+            url = build_absolute_uri(reverse(
+                'posts:sitemap_chunk',
+                kwargs={'section': section, 'chunk': chunk},
+            ))
+            yield f'<sitemap><loc>{escape(url)}</loc></sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def render_chunk(section, chunk, build_absolute_uri):
+    """XML куска карты сайта по частям."""
+    entries = SECTIONS[section][0]
+    yield XML_HEADER
+    yield f'<urlset xmlns="{XMLNS}">\n'
+    for url, lastmod in entries(chunk):
+        loc = escape(build_absolute_uri(url))
+        if lastmod is None:
+            yield f'<url><loc>{loc}</loc></url>\n'
+        else:
+            yield (
+                f'<url><loc>{loc}</loc>'
+                f'<lastmod>{lastmod.date().isoformat()}</lastmod></url>\n'
+            )
+    yield '</urlset>\n'
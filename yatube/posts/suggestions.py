@@ -0,0 +1,137 @@
+"""Рекомендации «на кого подписаться».
+
+Друзья друзей не считаются при запросе: это самосоединение Follow
+по всем подпискам. Команда rebuild_suggestions загружает граф подписок
+в компактные массивы целых чисел (строки в формате CSR) и для каждого
+пользователя выбирает FOLLOW_SUGGESTIONS_SIZE авторов, на которых
+подписано больше всего его авторов. Результат хранится в
+FollowSuggestion, и страница читает его одним запросом по индексу.
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Follow, FollowSuggestion
+from .rendering import AUTHOR_CARD_FIELDS
+
+# Сколько пользователей записывать за одну транзакцию.
+BATCH_SIZE = 500
+
+
+class FollowGraph:
+    """Граф подписок: вершины — индексы пользователей в `ids`,
+    подписки вершины i — targets[offsets[i]:offsets[i + 1]]."""
+
+    def __init__(self, ids, offsets, targets):
+        self.ids = ids
+        self.offsets = offsets
+        self.targets = targets
+
+    def __len__(self):
+        return len(self.ids)
+
+    def index(self, pk):
+        return bisect_left(self.ids, pk)
+
+    def followees(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+
+def load_graph():
+    """Читает все подписки одним проходом по итератору."""
+    users = array('q')
+    authors = array('q')
+    rows = Follow.objects.order_by('user_id', 'author_id').values_list(
+        'user_id', 'author_id'
+    )
+    for user_id, author_id in rows.iterator():
+        users.append(user_id)
+        authors.append(author_id)
+    ids = array('q', sorted(set(users).union(authors)))
+    offsets = array('q', bytes(8 * (len(ids) + 1)))
+    graph = FollowGraph(ids, offsets, array('q'))
+    for user_id in users:
+        offsets[graph.index(user_id) + 1] += 1
+    for node in range(len(ids)):
+        offsets[node + 1] += offsets[node]
+    graph.targets.extend(graph.index(author_id) for author_id in authors)
+    return graph
+
+
+def second_degree(graph, node, limit):
+    """Пары (вершина, число общих подписок) лучших кандидатов."""
+    direct = graph.followees(node)
+    skip = set(direct)
+    skip.add(node)
+    counts = Counter()
+    for author in direct:
+        counts.update(
+            target for target in graph.followees(author)
+            if target not in skip
+        )
+    return heapq.nsmallest(
+        limit, counts.items(), key=lambda item: (-item[1], item[0])
+    )
+
+
+def _save(user_ids, suggestions):
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user_id__in=user_ids).delete()
+        FollowSuggestion.objects.bulk_create(suggestions)
+
+
+def rebuild(limit=None, batch_size=BATCH_SIZE):
+    """Пересчитывает рекомендации всех пользователей и возвращает
+    число записанных строк."""
+    if limit is None:
+        limit = settings.FOLLOW_SUGGESTIONS_SIZE
+    graph = load_graph()
+    created = 0
+    user_ids = []
+    suggestions = []
+    for node in range(len(graph)):
+        if not graph.followees(node):
+            continue
+        user_id = graph.ids[node]
+        user_ids.append(user_id)
+        for rank, (target, score) in enumerate(
+            second_degree(graph, node, limit)
+        ):
+            suggestions.append(FollowSuggestion(
+                user_id=user_id, author_id=graph.ids[target],
+                score=score, rank=rank,
+            ))
+        if len(user_ids) == batch_size:
+            _save(user_ids, suggestions)
+            created += len(suggestions)
+            user_ids, suggestions = [], []
+    _save(user_ids, suggestions)
+    created += len(suggestions)
+    # Рекомендации тех, кто больше ни на кого не подписан.
+    FollowSuggestion.objects.exclude(
+        user_id__in=Follow.objects.values('user_id')
+    ).delete()
+    return created
+
+
+def suggestions_for(user, limit=None):
+    """Рекомендованные пользователю авторы одним запросом."""
+    if limit is None:
+        limit = settings.FOLLOW_SUGGESTIONS_SIZE
+    rows = FollowSuggestion.objects.filter(user_id=user.pk).select_related(
+        'author'
+    ).only(
+        'author', *(f'author__{field}' for field in AUTHOR_CARD_FIELDS)
+    )[:limit]
+    return [row.author for row in rows]
+
+
+def forget(user_id, author_id):
+    """Убирает рекомендацию автора, на которого пользователь подписался."""
+    FollowSuggestion.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
@@ -0,0 +1,47 @@
+"""Ключи кеширующего прокси для объектов posts."""
+from core import surrogate
+
+from . import registry
+
+INDEX_KEY = 'index'
+TRENDING_KEY = 'trending'
+
+
+def post_key(post_id):
+    return f'post:{post_id}'
+
+
+def author_key(author_id):
+    return f'author:{author_id}'
+
+
+def group_slug_key(slug):
+    return f'group:{slug}'
+
+
+def group_key(group_id):
+    """Ключ группы по её id; у удалённой группы ключа нет."""
+    group = registry.get_group(group_id)
+    return group_slug_key(group.slug) if group else None
+
+
+def post_keys(post):
+    """Ключи всех страниц, где может быть показан пост."""
+    return (
+        post_key(post.pk),
+        author_key(post.author_id),
+        group_key(post.group_id),
+        INDEX_KEY,
+    )
+
+
+def tag_posts(request, posts, *keys):
+    """Помечает ответ ключами показанных постов и их авторов и групп."""
+    surrogate.add_keys(request, *keys)
+    for post in posts:
+        surrogate.add_keys(
+            request,
+            post_key(post.pk),
+            author_key(post.author_id),
+            group_key(post.group_id),
+        )
@@ -0,0 +1,11 @@
+from django import template
+
+from posts import registry
+
+register = template.Library()
+
+
+@register.filter
+def group(group_id):
+    """Возвращает группу поста из реестра без запроса к БД."""
+    return registry.get_group(group_id)
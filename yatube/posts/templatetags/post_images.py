@@ -0,0 +1,19 @@
+from django import template
+
+from posts.images import image_variants, prefetch_thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/post_image.html', takes_context=True)
+def post_image(context, post):
+    """Картинка поста в нескольких ширинах и форматах.
+
+    При первом вызове за отрисовку загружает записи о миниатюрах
+    для всех постов страницы разом.
+    """
+    posts = context.get('page_obj', context.get('posts'))
+    if posts is not None and 'post_images' not in context.render_context:
+        context.render_context['post_images'] = True
+        prefetch_thumbnails(post.image for post in posts)
+    return {'image': image_variants(post.image)}
@@ -1,7 +1,9 @@
 import shutil
 import tempfile
+from http import HTTPStatus
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
@@ -126,3 +128,32 @@ class PostCreateFormTests(TestCase):
                 author=self.author,
             ).exists()
         )
+
+
+@override_settings(THROTTLE_RATES={'comment': '2/m'})
+class ThrottleTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='throttled_user')
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ThrottleTest.author)
+
+    def test_comments_over_rate_are_rejected(self):
+        """Комментарии сверх лимита отклоняются с ответом 429."""
+        url = reverse('posts:add_comment', kwargs={'post_id': self.post.id})
+        for _ in range(2):
+            self.authorized_client.post(url, data={'text': 'Комментарий'})
+        response = self.authorized_client.post(
+            url, data={'text': 'Комментарий'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(Comment.objects.count(), 2)
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaServingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.content = bytes(range(256)) * 4
+        for name in (
+            'posts/file.bin', 'cache/ab/thumb.bin', 'posts/картинка 1.bin'
+        ):
+            path = f'{TEMP_MEDIA_ROOT}/{name}'
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(cls.content)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_full_file(self):
+        """Файл отдаётся целиком с заголовками кеша."""
+        response = self.client.get('/media/posts/file.bin')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_range_request(self):
+        """Запрос с Range получает только нужные байты."""
+        response = self.client.get(
+            '/media/posts/file.bin', HTTP_RANGE='bytes=10-19'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.PARTIAL_CONTENT)
+        self.assertEqual(
+            b''.join(response.streaming_content), self.content[10:20]
+        )
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        response = self.client.get(
+            '/media/posts/file.bin', HTTP_RANGE='bytes=2000-'
+        )
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+
+    def test_conditional_request(self):
+        """Повторный запрос с ETag получает 304."""
+        etag = self.client.get('/media/posts/file.bin')['ETag']
+        response = self.client.get(
+            '/media/posts/file.bin', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_thumbnail_is_immutable(self):
+        """Миниатюры кешируются навсегда."""
+        response = self.client.get('/media/cache/ab/thumb.bin')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    @override_settings(MEDIA_OFFLOAD='x-accel-redirect')
+    def test_accel_redirect(self):
+        """Отдача файла передаётся nginx."""
+        response = self.client.get('/media/posts/file.bin')
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/file.bin'
+        )
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_OFFLOAD='x-accel-redirect')
+    def test_accel_redirect_quotes_path(self):
+        """Не-ASCII имя файла передаётся nginx в виде URI."""
+        response = self.client.get('/media/posts/картинка 1.bin')
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected-media/posts/'
+            '%D0%BA%D0%B0%D1%80%D1%82%D0%B8%D0%BD%D0%BA%D0%B0%201.bin',
+        )
+
+    @override_settings(MEDIA_OFFLOAD='x-sendfile')
+    def test_sendfile_falls_back_for_non_ascii_path(self):
+        """Файл с не-ASCII путём отдаётся без X-Sendfile."""
+        response = self.client.get('/media/posts/file.bin')
+        self.assertTrue(response['X-Sendfile'].endswith('posts/file.bin'))
+        response = self.client.get('/media/posts/картинка 1.bin')
+        self.assertFalse(response.has_header('X-Sendfile'))
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_path_outside_media_root(self):
+        """Файлы вне MEDIA_ROOT недоступны."""
+        response = self.client.get('/media/../manage.py')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -1,6 +1,28 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
 
-from posts.models import Group, Post, User
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import deletion
+from posts.models import (
+    Comment, DeletionTask, Follow, Group, Post, User
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
 
 
 class PostModelTest(TestCase):
@@ -48,3 +70,119 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     post._meta.get_field(value).help_text, expected)
+
+    def test_rendered_text_is_stored(self):
+        """HTML текста и его начало сохраняются вместе с постом."""
+        post = Post.objects.create(
+            author=PostModelTest.user,
+            text='<b>Жирный</b>\nвторая строка и ещё немного текста',
+        )
+        self.assertEqual(
+            post.text_html,
+            '&lt;b&gt;Жирный&lt;/b&gt;<br>вторая строка и ещё немного '
+            'текста',
+        )
+        self.assertEqual(post.excerpt, '<b>Жирный</b>\nвторая строка и…')
+
+    def test_render_posts_command_updates_stored_html(self):
+        """Команда render_posts пересчитывает сохранённый HTML."""
+        Post.objects.filter(pk=PostModelTest.post.pk).update(
+            text='Новый текст', text_html='', excerpt=''
+        )
+        call_command('render_posts', workers=1, stdout=StringIO())
+        post = Post.objects.get(pk=PostModelTest.post.pk)
+        self.assertEqual(post.text_html, 'Новый текст')
+        self.assertEqual(post.excerpt, 'Новый текст')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DeletionTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='prolific')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='doomed')
+        self.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=self.author, group=self.group
+            )
+            for number in range(5)
+        ]
+        self.image_post = Post.objects.create(
+            text='С картинкой', author=self.author,
+            image=SimpleUploadedFile('doomed.gif', SMALL_GIF, 'image/gif'),
+        )
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.author, author=self.reader)
+
+    def test_enqueue_deactivates_user(self):
+        """Пользователь в очереди не удалён, но войти не может."""
+        deletion.enqueue(self.author)
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        self.assertTrue(DeletionTask.objects.filter(
+            kind=DeletionTask.USER, object_id=self.author.pk
+        ).exists())
+
+    def test_user_deleted_in_batches(self):
+        """Пачки удаляют посты, комментарии, подписки и картинки."""
+        path = self.image_post.image.path
+        self.assertTrue(os.path.exists(path))
+        deletion.enqueue(self.author)
+        with mock.patch(
+            'posts.deletion.transaction.on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            call_command(
+                'process_deletions', batch_size=2, stdout=StringIO()
+            )
+        self.assertFalse(User.objects.filter(username='prolific').exists())
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(DeletionTask.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_images_deleted_after_commit(self):
+        """Картинка удаляется только после фиксации пачки."""
+        path = self.image_post.image.path
+        deletion.enqueue(self.author)
+        with mock.patch('posts.deletion.transaction.on_commit') as on_commit:
+            deletion.process_all(batch_size=2)
+        self.assertTrue(os.path.exists(path))
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        self.assertFalse(os.path.exists(path))
+
+    def test_group_deleted_without_posts(self):
+        """Удаление группы оставляет её посты без группы."""
+        deletion.enqueue(self.group)
+        self.assertEqual(deletion.process_all(batch_size=2), 1)
+        self.assertFalse(Group.objects.filter(slug='doomed').exists())
+        self.assertEqual(Post.objects.filter(group=None).count(), 6)
+
+    def test_admin_queues_deletion(self):
+        """Удаление в админке только ставит объект в очередь."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        self.client.post(
+            reverse('admin:posts_group_delete', args=(self.group.pk,)),
+            {'post': 'yes'},
+        )
+        self.client.post(reverse('admin:auth_user_changelist'), {
+            'action': 'delete_selected',
+            '_selected_action': [self.author.pk],
+            'post': 'yes',
+        })
+        self.assertTrue(Group.objects.filter(pk=self.group.pk).exists())
+        self.assertTrue(User.objects.filter(pk=self.author.pk).exists())
+        self.assertEqual(DeletionTask.objects.count(), 2)
@@ -1,15 +1,31 @@
 import shutil
 import tempfile
+from datetime import datetime, timedelta
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from posts.models import Follow, Group, Post, User
+from core import surrogate, versioning
+from posts import (
+    archive, dates, group_stats, prerender, registry, sitemaps, suggestions,
+    surrogates, trending, unread,
+)
+from posts.models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, FollowSuggestion, Group,
+    GroupStats, Post, TrendingScore, User
+)
+from posts.rendering import PREVIEW_LENGTH
 from posts.views import AMOUNT_POSTS
 
 AMOUND_POSTS_ADD = 13
@@ -149,6 +165,16 @@ class PostsPagesTests(TestCase):
                 first_object = response.context['page_obj'][0]
                 self.assert_post_context(first_object)
 
+    def test_index_renders_responsive_image(self):
+        """Картинка поста выводится с вариантами разной ширины."""
+        cache.clear()
+        response = self.guest_client.get(reverse('posts:index'))
+        content = response.content.decode()
+        self.assertIn('<picture>', content)
+        for width in settings.POST_IMAGE_WIDTHS:
+            with self.subTest(width=width):
+                self.assertIn(f' {width}w', content)
+
     def test_post_detail_correct_context(self):
         """Шаблон post_detail сформирован с правильным контекстом.
         Тестовый пост отображается на странице
@@ -311,3 +337,793 @@ class FollowTest(TestCase):
             'posts:profile_follow', kwargs={'username': 'following'})
         )
         self.assertEqual(Follow.objects.count(), follow_count)
+
+
+class AuthorCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='cached_author')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_profile_uses_cached_author(self):
+        """Повторный запрос профиля не загружает автора из БД."""
+        url = reverse('posts:profile', kwargs={'username': 'cached_author'})
+        self.guest_client.get(url)
+        # Остаётся только подсчёт постов для паджинатора.
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(url)
+        self.assertEqual(response.context['author'], AuthorCacheTest.author)
+
+    def test_unknown_username_is_cached(self):
+        """Неизвестное имя отдаёт 404 без повторного запроса в БД."""
+        url = reverse('posts:profile', kwargs={'username': 'nobody'})
+        self.assertEqual(
+            self.guest_client.get(url).status_code, HTTPStatus.NOT_FOUND
+        )
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_renamed_author_leaves_cache(self):
+        """Переименование пользователя сбрасывает старое имя."""
+        user = User.objects.create_user(username='old_name')
+        old_url = reverse('posts:profile', kwargs={'username': 'old_name'})
+        self.guest_client.get(old_url)
+        user.username = 'new_name'
+        with mock.patch(
+            'users.signals.transaction.on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            user.save()
+        self.assertEqual(
+            self.guest_client.get(old_url).status_code, HTTPStatus.NOT_FOUND
+        )
+        new_url = reverse('posts:profile', kwargs={'username': 'new_name'})
+        self.assertEqual(
+            self.guest_client.get(new_url).status_code, HTTPStatus.OK
+        )
+
+
+class GroupRegistryTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='registry_user')
+        cls.group = Group.objects.create(
+            title='Группа реестра',
+            slug='registry-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(GroupRegistryTest.author)
+
+    def test_group_page_reads_group_from_registry(self):
+        """Страница группы не запрашивает группу из БД."""
+        url = reverse('posts:group_list', kwargs={'slug': 'registry-slug'})
+        self.client.get(url)
+        # Остаётся только подсчёт постов для паджинатора.
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.context['group'], GroupRegistryTest.group)
+
+    def test_new_group_appears_in_form_choices(self):
+        """Созданная группа сразу появляется в форме поста."""
+        url = reverse('posts:post_create')
+        self.authorized_client.get(url)
+        new_group = Group.objects.create(
+            title='Новая группа',
+            slug='new-registry-slug',
+            description='Тестовое описание',
+        )
+        response = self.authorized_client.get(url)
+        choices = dict(response.context['form'].fields['group'].choices)
+        self.assertEqual(choices[new_group.pk], 'Новая группа')
+
+    def test_version_changes_after_commit(self):
+        """Версия реестра для других процессов меняется после фиксации."""
+        version = versioning.get(registry.VERSION_KEY)
+        with mock.patch('posts.signals.transaction.on_commit') as on_commit:
+            Group.objects.create(title='Ещё группа', slug='later-slug')
+        self.assertEqual(versioning.get(registry.VERSION_KEY), version)
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        self.assertNotEqual(versioning.get(registry.VERSION_KEY), version)
+
+
+class PrerenderTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='prerender_user')
+        cls.group = Group.objects.create(
+            title='Горячая группа',
+            slug='hot-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(text='Горячий пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        # Обращения, накопленные процессом в других тестах.
+        prerender._pending['hits'].clear()
+        self.index_url = reverse('posts:index')
+
+    def test_prerendered_page_is_served_without_queries(self):
+        """Готовая страница отдаётся анониму без запросов к БД."""
+        prerender.refresh([self.index_url])
+        with self.assertNumQueries(0):
+            response = self.client.get(self.index_url)
+        self.assertContains(response, 'Горячий пост')
+
+    def test_write_expires_prerendered_page(self):
+        """После изменения постов готовая страница не отдаётся."""
+        prerender.refresh([self.index_url])
+        Post.objects.create(text='Свежий пост', author=PrerenderTest.author)
+        self.assertIsNone(prerender.get_page(self.index_url))
+        self.assertEqual(prerender.refresh([self.index_url]), 1)
+        self.assertIsNotNone(prerender.get_page(self.index_url))
+
+    def test_authorized_user_gets_live_page(self):
+        """Авторизованный пользователь получает страницу из шаблона."""
+        prerender.refresh([self.index_url])
+        self.client.force_login(PrerenderTest.author)
+        response = self.client.get(self.index_url)
+        self.assertIsNotNone(response.context)
+
+    @override_settings(PRERENDER_HITS_FLUSH_INTERVAL=0)
+    def test_hot_pages_are_learned_from_hits(self):
+        """Посещаемые страницы попадают в список для отрисовки."""
+        group_url = reverse('posts:group_list', kwargs={'slug': 'hot-slug'})
+        for _ in range(3):
+            self.client.get(group_url)
+        self.assertIn(group_url, prerender.hot_paths(limit=1))
+
+    @override_settings(PRERENDER_HITS_FLUSH_INTERVAL=0)
+    def test_missing_pages_are_not_counted(self):
+        """Обращения к несуществующим страницам не учитываются."""
+        for number in range(3):
+            url = reverse(
+                'posts:profile', kwargs={'username': f'nobody{number}'}
+            )
+            self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(prerender.hot_paths(limit=10), ['/'])
+
+    @override_settings(
+        PRERENDER_HITS_FLUSH_INTERVAL=0, PRERENDER_HOT_PAGES=1
+    )
+    def test_hot_list_is_bounded(self):
+        """Список горячих страниц не растёт с числом адресов."""
+        prerender.flush_hits({f'/profile/user{n}/': n for n in range(50)})
+        hot = cache.get(prerender.HOT_KEY)
+        self.assertEqual(len(hot['counts']), prerender.HOT_CAPACITY_FACTOR)
+        self.assertEqual(prerender.hot_paths(limit=1)[1], '/profile/user49/')
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='trending_user')
+        cls.quiet_post = Post.objects.create(
+            text='Тихий пост', author=cls.author
+        )
+        cls.hot_post = Post.objects.create(
+            text='Обсуждаемый пост', author=cls.author
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(TrendingTest.author)
+
+    def comment(self, post, times=1):
+        url = reverse('posts:add_comment', kwargs={'post_id': post.pk})
+        for _ in range(times):
+            self.authorized_client.post(url, {'text': 'Комментарий'})
+
+    def test_comments_raise_score(self):
+        """Комментарий увеличивает рейтинг поста."""
+        self.comment(TrendingTest.hot_post, times=2)
+        score = TrendingScore.objects.get(post=TrendingTest.hot_post)
+        self.assertEqual(score.score, 2)
+
+    def test_trending_page_orders_by_score(self):
+        """Страница популярного показывает посты по рейтингу
+        одним запросом."""
+        self.comment(TrendingTest.quiet_post)
+        self.comment(TrendingTest.hot_post, times=3)
+        with self.assertNumQueries(1):
+            posts = trending.top_posts()
+        self.assertEqual(
+            posts, [TrendingTest.hot_post, TrendingTest.quiet_post]
+        )
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(response.context['posts'], posts)
+
+    def test_decay_removes_cold_posts(self):
+        """Затухание уменьшает рейтинги и удаляет остывшие посты."""
+        trending.record_comment(TrendingTest.hot_post.pk, weight=4)
+        trending.record_comment(TrendingTest.quiet_post.pk, weight=0.015)
+        deleted = trending.decay(settings.TRENDING_HALF_LIFE)
+        self.assertEqual(deleted, 1)
+        score = TrendingScore.objects.get()
+        self.assertEqual(score.post_id, TrendingTest.hot_post.pk)
+        self.assertAlmostEqual(score.score, 2)
+
+
+class GroupStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='stats_user')
+
+    def setUp(self):
+        self.group = Group.objects.create(
+            title='Группа со статистикой',
+            slug='stats-slug',
+            description='Тестовое описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-stats-slug',
+            description='Тестовое описание',
+        )
+        self.first = Post.objects.create(
+            text='Первый пост', author=GroupStatsTest.author, group=self.group
+        )
+        self.second = Post.objects.create(
+            text='Второй пост', author=GroupStatsTest.author, group=self.group
+        )
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def test_new_posts_update_stats(self):
+        """Новый пост увеличивает счётчик и становится последним."""
+        stats = self.stats(self.group)
+        self.assertEqual(stats.post_count, 2)
+        self.assertEqual(stats.latest_post, self.second)
+        self.assertEqual(stats.last_post_at, self.second.pub_date)
+
+    def test_moved_post_updates_both_groups(self):
+        """Перенос поста пересчитывает обе группы."""
+        self.second.group = self.other_group
+        self.second.save()
+        self.assertEqual(self.stats(self.group).post_count, 1)
+        self.assertEqual(self.stats(self.group).latest_post, self.first)
+        self.assertEqual(self.stats(self.other_group).post_count, 1)
+
+    def test_deleted_latest_post_is_replaced(self):
+        """После удаления последнего поста последним становится
+        предыдущий."""
+        self.second.delete()
+        stats = self.stats(self.group)
+        self.assertEqual(stats.post_count, 1)
+        self.assertEqual(stats.latest_post, self.first)
+
+    def test_deleted_group_keeps_posts(self):
+        """Удаление группы убирает статистику, но не посты."""
+        self.group.delete()
+        self.assertFalse(GroupStats.objects.filter(pk=self.group.pk).exists())
+        self.first.refresh_from_db()
+        self.assertIsNone(self.first.group)
+
+    def test_rebuild_matches_signals(self):
+        """Полный пересчёт даёт те же значения, что и сигналы."""
+        expected = list(GroupStats.objects.order_by('pk').values())
+        group_stats.rebuild()
+        self.assertEqual(
+            list(GroupStats.objects.order_by('pk').values()), expected
+        )
+
+    def test_group_index_uses_one_query(self):
+        """Каталог групп читает статистику одним запросом."""
+        url = reverse('posts:group_index')
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertIn(
+            (self.group, self.stats(self.group)), response.context['groups']
+        )
+
+
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='archive_user')
+        cls.group = Group.objects.create(
+            title='Архивная группа',
+            slug='archive-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.posts = [
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=ArchiveTest.author,
+                group=ArchiveTest.group,
+            )
+            for number in range(AMOUNT_POSTS + 2)
+        ]
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': 'archive_user'}
+        )
+
+    def archive_oldest(self, count):
+        old = timezone.now() - timedelta(days=400)
+        for days, post in enumerate(self.posts[:count]):
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=old - timedelta(days=days)
+            )
+        return archive.archive(days=365, batch_size=2)
+
+    def test_old_posts_move_with_comments(self):
+        """Старые посты переносятся в архив вместе с комментариями."""
+        Comment.objects.create(
+            post=self.posts[0], author=ArchiveTest.author, text='Старый'
+        )
+        self.assertEqual(self.archive_oldest(3), 3)
+        self.assertEqual(ArchivedPost.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), AMOUNT_POSTS - 1)
+        comment = ArchivedComment.objects.get()
+        self.assertEqual(comment.post_id, self.posts[0].pk)
+        self.assertEqual(
+            GroupStats.objects.get(group=ArchiveTest.group).post_count,
+            AMOUNT_POSTS + 2,
+        )
+
+    def test_feed_continues_into_archive(self):
+        """Вторая страница ленты дочитывается из архива."""
+        self.archive_oldest(5)
+        response = self.client.get(self.profile_url + '?page=2')
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 2)
+        self.assertIsInstance(page_obj[0], ArchivedPost)
+        self.assertEqual(page_obj.paginator.count, AMOUNT_POSTS + 2)
+
+    def test_first_page_does_not_read_archive(self):
+        """Первая страница не обращается к архиву, пока хватает
+        оперативных постов."""
+        self.archive_oldest(2)
+        self.client.get(self.profile_url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.profile_url)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('archivedpost', sql)
+
+    def test_archived_post_detail(self):
+        """Архивный пост открывается по прежнему адресу без формы
+        комментария."""
+        self.archive_oldest(1)
+        self.client.force_login(ArchiveTest.author)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.posts[0].pk})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.context['archived'])
+        self.assertNotContains(response, 'Добавить комментарий')
+
+
+class DateArchiveTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='dates_user')
+
+    def setUp(self):
+        cache.clear()
+        self.march = [
+            self.create_post(datetime(2020, 3, day)) for day in (1, 2)
+        ]
+        self.april = self.create_post(datetime(2020, 4, 15))
+
+    def create_post(self, pub_date):
+        post = Post.objects.create(text='Пост', author=DateArchiveTest.author)
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=timezone.make_aware(pub_date)
+        )
+        return post
+
+    def test_month_counts_are_cached(self):
+        """Число постов по месяцам считается один раз."""
+        url = reverse('posts:index_archive')
+        response = self.client.get(url)
+        months = [
+            (month['date'].month, month['count'])
+            for month in response.context['months']
+        ]
+        self.assertEqual(months, [(4, 1), (3, 2)])
+        feed = archive.ChainedFeed(
+            Post.objects.all(), ArchivedPost.objects.all(), 'index'
+        )
+        # Остаётся подсчёт постов текущего месяца.
+        with self.assertNumQueries(1):
+            dates.month_counts(feed)
+
+    def test_month_page_shows_only_its_posts(self):
+        """Страница месяца показывает посты только за этот месяц."""
+        response = self.client.get(reverse(
+            'posts:profile_archive',
+            kwargs={'username': 'dates_user', 'year': 2020, 'month': 3},
+        ))
+        self.assertEqual(
+            set(response.context['page_obj']), set(self.march)
+        )
+
+    def test_deleted_post_resets_month_counts(self):
+        """Удаление поста сбрасывает счётчики месяцев."""
+        url = reverse('posts:index_archive')
+        self.client.get(url)
+        self.april.delete()
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['months']), 1)
+
+    def test_invalid_date_returns_404(self):
+        """Несуществующая дата отдаёт 404."""
+        response = self.client.get(reverse(
+            'posts:index_archive', kwargs={'year': 2020, 'month': 13}
+        ))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class SitemapTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='sitemap_user')
+        cls.group = Group.objects.create(
+            title='Группа карты сайта',
+            slug='sitemap-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(text='Пост', author=cls.author)
+            for _ in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def content(self, response):
+        if response.streaming:
+            return b''.join(response.streaming_content).decode()
+        return response.content.decode()
+
+    def chunk_url(self, section, chunk):
+        return reverse(
+            'posts:sitemap_chunk', kwargs={'section': section, 'chunk': chunk}
+        )
+
+    def test_index_lists_every_section(self):
+        """Индекс карты сайта ссылается на части всех разделов."""
+        content = self.content(self.client.get(reverse('posts:sitemap')))
+        for section in sitemaps.SECTIONS:
+            self.assertIn(self.chunk_url(section, 0), content)
+
+    def test_chunk_lists_posts_with_lastmod(self):
+        """Часть раздела постов содержит адреса постов и даты."""
+        post = SitemapTest.posts[0]
+        content = self.content(self.client.get(self.chunk_url('posts', 0)))
+        self.assertIn(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}), content
+        )
+        self.assertIn(
+            f'<lastmod>{post.pub_date.date().isoformat()}</lastmod>', content
+        )
+        self.assertIn(
+            reverse('posts:group_list', kwargs={'slug': 'sitemap-slug'}),
+            self.content(self.client.get(self.chunk_url('groups', 0))),
+        )
+
+    def test_static_chunk_is_cached(self):
+        """Все части, кроме последней, берутся из кеша."""
+        first_id = SitemapTest.posts[0].pk
+        with self.settings(SITEMAP_CHUNK_SIZE=first_id + 1):
+            url = self.chunk_url('posts', 0)
+            expected = self.content(self.client.get(url))
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.content.decode(), expected)
+
+    def test_unknown_chunk_returns_404(self):
+        """Несуществующая часть карты сайта отдаёт 404."""
+        response = self.client.get(self.chunk_url('posts', 10 ** 6))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class PostPreviewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='preview_user')
+        cls.post = Post.objects.create(
+            text='а' * PREVIEW_LENGTH + 'хвост', author=cls.author
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse(
+            'posts:profile', kwargs={'username': 'preview_user'}
+        )
+
+    def test_listing_shows_bounded_preview(self):
+        """Лента показывает превью и ссылку на полный текст."""
+        response = self.client.get(self.url)
+        self.assertContains(response, 'читать дальше')
+        self.assertNotContains(response, 'хвост')
+        detail = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': PostPreviewTest.post.pk}
+        ))
+        self.assertContains(detail, 'хвост')
+
+    def test_listing_does_not_read_full_text(self):
+        """Запрос ленты не читает столбцы с полным текстом."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertIn('"preview_html"', sql)
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn('"text_html"', sql)
+
+
+class FeedProjectionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='card_user', first_name='Имя', last_name='Фамилия',
+            email='card@example.com',
+        )
+        for number in range(5):
+            Post.objects.create(text=f'Карточка {number}', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_index_reads_only_card_columns(self):
+        """Главная читает посты с авторами одним запросом и без лишних
+        столбцов пользователя."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Карточка 0')
+        post_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+            and 'COUNT(' not in query['sql']
+        ]
+        self.assertEqual(len(post_queries), 1)
+        self.assertIn('"username"', post_queries[0])
+        self.assertNotIn('"password"', post_queries[0])
+        self.assertNotIn('"email"', post_queries[0])
+
+    def test_feed_benchmark(self):
+        """Команда сравнения запросов ленты показывает экономию."""
+        out = StringIO()
+        call_command('feed_benchmark', posts=3, stdout=out)
+        output = out.getvalue()
+        self.assertIn('Постов на странице: 3', output)
+        self.assertIn('full', output)
+        self.assertIn('lean', output)
+
+    def test_feed_benchmark_without_posts(self):
+        """Без постов команде нечего сравнивать."""
+        Post.objects.all().delete()
+        out = StringIO()
+        call_command('feed_benchmark', stdout=out)
+        self.assertIn('Нет постов.', out.getvalue())
+
+
+class SurrogateKeyTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='surrogate_user')
+        cls.group = Group.objects.create(
+            title='Группа', slug='surrogate-slug', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Текст', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        surrogate.purged.clear()
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': SurrogateKeyTest.post.pk}
+        )
+
+    def test_anonymous_response_is_tagged(self):
+        """Ответ анонимному посетителю помечен ключами и кешируется
+        прокси."""
+        response = self.client.get(self.url)
+        keys = response['Surrogate-Key'].split()
+        for key in surrogates.post_keys(SurrogateKeyTest.post)[:3]:
+            self.assertIn(key, keys)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage=', response['Cache-Control'])
+
+    def test_authenticated_response_is_private(self):
+        """Ответ вошедшему пользователю прокси не кеширует."""
+        self.client.force_login(SurrogateKeyTest.author)
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('Surrogate-Key'))
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_response_with_cookie_is_private(self):
+        """Ответ, которому CsrfViewMiddleware поставил cookie, прокси
+        не кеширует."""
+        # Так выглядит запрос, при обработке которого вызван get_token().
+        response = self.client.get(
+            self.url, CSRF_COOKIE='a' * 64, CSRF_COOKIE_USED=True
+        )
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        self.assertFalse(response.has_header('Surrogate-Key'))
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_new_post_purges_its_pages(self):
+        """Новый пост сбрасывает ленты, где он появится."""
+        with mock.patch(
+            'core.surrogate.transaction.on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            post = Post.objects.create(
+                text='Новый', author=SurrogateKeyTest.author,
+                group=SurrogateKeyTest.group,
+            )
+        for key in surrogates.post_keys(post):
+            self.assertIn(key, surrogate.purged)
+
+
+class FollowSuggestionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.friend = User.objects.create_user(username='friend')
+        cls.other = User.objects.create_user(username='other')
+        cls.popular = User.objects.create_user(
+            username='popular', first_name='Популярный', last_name='Автор'
+        )
+        cls.rare = User.objects.create_user(username='rare')
+        Follow.objects.bulk_create([
+            Follow(user=cls.reader, author=cls.friend),
+            Follow(user=cls.reader, author=cls.other),
+            Follow(user=cls.friend, author=cls.popular),
+            Follow(user=cls.other, author=cls.popular),
+            Follow(user=cls.other, author=cls.rare),
+            Follow(user=cls.friend, author=cls.reader),
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(FollowSuggestionTest.reader)
+
+    def test_rebuild_ranks_second_degree_authors(self):
+        """Рекомендуются авторы подписок, кроме своих подписок и себя,
+        по числу общих подписок."""
+        suggestions.rebuild()
+        rows = FollowSuggestion.objects.filter(
+            user=FollowSuggestionTest.reader
+        ).values_list('author__username', 'score')
+        self.assertEqual(list(rows), [('popular', 2), ('rare', 1)])
+        self.assertEqual(
+            suggestions.suggestions_for(FollowSuggestionTest.reader, 1),
+            [FollowSuggestionTest.popular],
+        )
+
+    def test_widget_on_follow_page_and_profile(self):
+        """Блок рекомендаций есть в ленте подписок и в профиле."""
+        suggestions.rebuild()
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', kwargs={'username': 'friend'}),
+        ):
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.client.get(url), 'Популярный Автор'
+                )
+
+    def test_follow_removes_suggestion(self):
+        """После подписки автор пропадает из рекомендаций."""
+        suggestions.rebuild()
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'popular'})
+        )
+        self.assertEqual(
+            suggestions.suggestions_for(FollowSuggestionTest.reader),
+            [FollowSuggestionTest.rare],
+        )
+
+
+class UnreadPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='unread_reader')
+        cls.author = User.objects.create_user(username='unread_author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(UnreadPostsTest.reader)
+        # Читатель уже заходил на сайт: новые посты считаются с этого
+        # момента.
+        unread.count(UnreadPostsTest.reader.pk)
+
+    def create_post(self, text='Пост'):
+        with mock.patch(
+            'posts.signals.transaction.on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            return Post.objects.create(
+                text=text, author=UnreadPostsTest.author
+            )
+
+    def test_new_posts_are_counted_for_followers(self):
+        """Новые посты автора увеличивают счётчик подписчика."""
+        for number in range(2):
+            self.create_post(f'Пост {number}')
+        self.assertEqual(unread.count(UnreadPostsTest.reader.pk), 2)
+        self.assertEqual(unread.count(UnreadPostsTest.author.pk), 0)
+
+    def test_count_reads_cache_twice(self):
+        """Счётчик читает ключ читателя и счётчики всех его авторов
+        одним пакетом, сколько бы авторов ни было."""
+        for number in range(3):
+            author = User.objects.create_user(username=f'unread_{number}')
+            Follow.objects.create(user=UnreadPostsTest.reader, author=author)
+        with mock.patch('posts.unread.cache', wraps=cache) as cache_mock:
+            with self.assertNumQueries(0):
+                unread.count(UnreadPostsTest.reader.pk)
+        self.assertEqual(cache_mock.get.call_count, 1)
+        self.assertEqual(cache_mock.get_many.call_count, 1)
+        self.assertEqual(len(cache_mock.get_many.call_args[0][0]), 4)
+
+    def test_post_is_counted_after_commit(self):
+        """Пост учитывается только после фиксации транзакции."""
+        with mock.patch('posts.signals.transaction.on_commit') as on_commit:
+            Post.objects.create(text='Пост', author=UnreadPostsTest.author)
+        self.assertEqual(unread.count(UnreadPostsTest.reader.pk), 0)
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        self.assertEqual(unread.count(UnreadPostsTest.reader.pk), 1)
+
+    def test_new_author_old_posts_are_not_new(self):
+        """Старые посты нового автора в подписке не считаются новыми."""
+        other = User.objects.create_user(username='unread_other')
+        Post.objects.create(text='Старый пост', author=other)
+        Follow.objects.create(user=UnreadPostsTest.reader, author=other)
+        self.assertEqual(unread.count(UnreadPostsTest.reader.pk), 0)
+
+    def test_header_shows_badge(self):
+        """Число новых постов показано в шапке."""
+        self.create_post()
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(response.context['unread_posts'], 1)
+        self.assertContains(response, '<span class="badge bg-danger">1')
+
+    def test_follow_index_shows_post_behind_badge(self):
+        """Пост, о котором сообщил счётчик, виден в ленте подписок,
+        даже если её фрагмент уже закеширован."""
+        self.create_post('Первый пост')
+        self.client.get(reverse('posts:follow_index'))
+        self.create_post('Второй пост')
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Второй пост')
+
+    def test_follow_index_resets_counter(self):
+        """Просмотр ленты подписок обнуляет счётчик."""
+        self.create_post()
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['unread_posts'], 0)
+        self.assertEqual(unread.count(UnreadPostsTest.reader.pk), 0)
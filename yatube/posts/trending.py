@@ -0,0 +1,61 @@
+"""Рейтинг популярных постов с затуханием.
+
+Рейтинг не считается агрегатом по всем комментариям: каждый новый
+комментарий увеличивает строку поста в TrendingScore, а decay()
+умножает все рейтинги на множитель затухания и удаляет остывшие посты.
+Топ читается одним запросом по индексу на score.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import TrendingScore
+from .rendering import card_fields
+
+
+def record_comment(post_id, weight=1.0):
+    """Добавляет комментарий к рейтингу поста."""
+    updated = TrendingScore.objects.filter(post_id=post_id).update(
+        score=F('score') + weight
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            TrendingScore.objects.create(post_id=post_id, score=weight)
+    except IntegrityError:
+        # Строку только что создал параллельный запрос.
+        TrendingScore.objects.filter(post_id=post_id).update(
+            score=F('score') + weight
+        )
+
+
+def decay_factor(interval, half_life=None):
+    """Множитель, на который рейтинг уменьшается за `interval` секунд."""
+    if half_life is None:
+        half_life = settings.TRENDING_HALF_LIFE
+    return 0.5 ** (interval / half_life)
+
+
+def decay(interval, min_score=None):
+    """Уменьшает все рейтинги и возвращает число удалённых постов."""
+    if min_score is None:
+        min_score = settings.TRENDING_MIN_SCORE
+    with transaction.atomic():
+        TrendingScore.objects.update(
+            score=F('score') * decay_factor(interval)
+        )
+        deleted, _ = TrendingScore.objects.filter(
+            score__lt=min_score
+        ).delete()
+    return deleted
+
+
+def top_posts(limit=None):
+    """Самые популярные посты одним запросом."""
+    if limit is None:
+        limit = settings.TRENDING_SIZE
+    scores = TrendingScore.objects.select_related('post__author').only(
+        'post', *card_fields('post__')
+    ).order_by('-score')[:limit]
+    return [score.post for score in scores]
@@ -0,0 +1,90 @@
+"""Счётчик новых постов авторов из подписки.
+
+Проверка новостей не должна запускать запрос ленты подписок. Для
+каждого автора в кеше хранится счётчик его постов: новый пост после
+фиксации транзакции увеличивает только его, сколько бы ни было
+подписчиков. Для пользователя хранятся значения счётчиков его авторов
+на момент последнего просмотра ленты подписок. Число новых постов —
+сумма разностей. Его дают чтение ключа пользователя и одно пакетное
+чтение (get_many) счётчиков всех его авторов, без запросов к БД;
+в core.cache.TwoLevelCache это не больше двух запросов к SQLite.
+"""
+from django.core.cache import cache
+
+from .models import Follow
+
+SEEN_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def author_key(author_id):
+    return f'posts:unread:author:{author_id}'
+
+
+def seen_key(user_id):
+    return f'posts:unread:seen:{user_id}'
+
+
+def record_post(author_id):
+    """Учитывает новый пост автора."""
+    key = author_key(author_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Потерянный счётчик начинается заново; отрицательные разности
+        # ниже считаются нулём.
+        cache.add(key, 1, None)
+
+
+def _counters(author_ids):
+    keys = {author_key(author_id): author_id for author_id in author_ids}
+    values = cache.get_many(keys)
+    return {
+        author_id: values.get(key, 0) for key, author_id in keys.items()
+    }
+
+
+def _seen(user_id):
+    """Счётчики авторов пользователя на момент последнего просмотра."""
+    seen = cache.get(seen_key(user_id))
+    if seen is None:
+        authors = Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True
+        )
+        seen = _counters(authors)
+        cache.set(seen_key(user_id), seen, SEEN_TIMEOUT)
+    return seen
+
+
+def count(user_id):
+    seen = _seen(user_id)
+    counters = _counters(seen)
+    return sum(
+        max(0, counters[author_id] - value)
+        for author_id, value in seen.items()
+    )
+
+
+def reset(user_id):
+    """Отмечает ленту подписок просмотренной.
+
+    Возвращает сумму счётчиков авторов: она меняется с каждым их новым
+    постом и годится как версия ленты.
+    """
+    seen = _counters(_seen(user_id))
+    cache.set(seen_key(user_id), seen, SEEN_TIMEOUT)
+    return sum(seen.values())
+
+
+def follow_changed(user_id, author_id, following):
+    """Добавляет автора к просмотренным или убирает его.
+
+    Старые посты нового автора новыми не считаются.
+    """
+    seen = cache.get(seen_key(user_id))
+    if seen is None:
+        return
+    if following:
+        seen[author_id] = _counters([author_id])[author_id]
+    else:
+        seen.pop(author_id, None)
+    cache.set(seen_key(user_id), seen, SEEN_TIMEOUT)
@@ -4,8 +4,31 @@ from . import views
 
 app_name = 'posts'
 
+
+def date_archive_paths(prefix, view, name):
+    """Адреса архива ленты: корень, год, месяц и день."""
+    return [
+        path(f'{prefix}archive/', view, name=name),
+        path(f'{prefix}archive/<int:year>/', view, name=name),
+        path(f'{prefix}archive/<int:year>/<int:month>/', view, name=name),
+        path(
+            f'{prefix}archive/<int:year>/<int:month>/<int:day>/',
+            view,
+            name=name
+        ),
+    ]
+
+
 urlpatterns = [
     path('', views.index, name='index'),
+    path('trending/', views.trending_posts, name='trending'),
+    path('sitemap.xml', views.sitemap_index, name='sitemap'),
+    path(
+        'sitemaps/<slug:section>/<int:chunk>.xml',
+        views.sitemap_chunk,
+        name='sitemap_chunk'
+    ),
+    path('group/', views.group_index, name='group_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
@@ -26,3 +49,11 @@ urlpatterns = [
         name='profile_unfollow'
     ),
 ]
+
+urlpatterns += date_archive_paths('', views.index_archive, 'index_archive')
+urlpatterns += date_archive_paths(
+    'group/<slug:slug>/', views.group_archive, 'group_archive'
+)
+urlpatterns += date_archive_paths(
+    'profile/<str:username>/', views.profile_archive, 'profile_archive'
+)
@@ -1,12 +1,24 @@
+from core import surrogate
+from core.throttle import throttle
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from users.cache import get_author_or_404
 
+from . import (
+    archive, dates, group_stats, registry, sitemaps, suggestions, surrogates,
+    trending, unread,
+)
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from .models import ArchivedPost, Post, Follow
+from .rendering import CARD_FIELDS, cards
 
 AMOUNT_POSTS = 10
 AMOUNT_LETTERS = 30
+SITEMAP_CONTENT_TYPE = 'application/xml'
 
 
 def paginator_add(list, request):
@@ -16,19 +28,71 @@ def paginator_add(list, request):
     return page_obj
 
 
+def index_feed():
+    return archive.ChainedFeed(
+        cards(Post.objects.all()), cards(ArchivedPost.objects.all()), 'index'
+    )
+
+
+def group_feed(group):
+    return archive.ChainedFeed(
+        cards(Post.objects.filter(group_id=group.pk)),
+        cards(ArchivedPost.objects.filter(group_id=group.pk)),
+        f'group:{group.pk}',
+    )
+
+
+def author_feed(author):
+    # Автор у постов уже есть: соединение с пользователями не нужно.
+    return archive.ChainedFeed(
+        author.posts.only(*CARD_FIELDS),
+        cards(ArchivedPost.objects.filter(author_id=author.pk)),
+        f'author:{author.pk}',
+    )
+
+
+def get_group_or_404(slug):
+    group = registry.get_group_by_slug(slug)
+    if group is None:
+        raise Http404('Группа не найдена.')
+    return group
+
+
 def index(request):
-    post_list = Post.objects.all()
+    post_list = index_feed()
     page_obj = paginator_add(post_list, request)
+    surrogates.tag_posts(request, page_obj, surrogates.INDEX_KEY)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+def trending_posts(request):
+    posts = trending.top_posts()
+    surrogates.tag_posts(request, posts, surrogates.TRENDING_KEY)
+    context = {
+        'posts': posts,
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+def group_index(request):
+    groups = group_stats.directory()
+    group_keys = [surrogates.group_slug_key(group.slug) for group, _ in groups]
+    surrogate.add_keys(request, *group_keys)
+    context = {
+        'groups': groups,
+    }
+    return render(request, 'posts/group_index.html', context)
+
+
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author').all()
-    page_obj = paginator_add(posts, request)
+    group = get_group_or_404(slug)
+    page_obj = paginator_add(group_feed(group), request)
+    surrogates.tag_posts(
+        request, page_obj, surrogates.group_slug_key(group.slug)
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -37,9 +101,11 @@ def group_posts(request, slug):
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    author_posts = author.posts.all()
-    page_obj = paginator_add(author_posts, request)
+    author = get_author_or_404(username)
+    page_obj = paginator_add(author_feed(author), request)
+    surrogates.tag_posts(
+        request, page_obj, surrogates.author_key(author.pk)
+    )
     user = request.user
     following = user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author).exists()
@@ -47,23 +113,95 @@ def profile(request, username):
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'suggestions': (
+            suggestions.suggestions_for(user) if user.is_authenticated
+            else ()
+        ),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def render_date_archive(request, feed, url_name, url_kwargs, context,
+                        year=None, month=None, day=None):
+    """Навигация по месяцам ленты и её посты за год, месяц или день."""
+    months = [
+        {
+            'date': month_date,
+            'count': count,
+            'url': reverse(url_name, kwargs=dict(
+                url_kwargs, year=month_date.year, month=month_date.month
+            )),
+        }
+        for month_date, count in dates.month_counts(feed)
+    ]
+    context['months'] = months
+    if year is not None:
+        start, end = dates.period_bounds(year, month, day)
+        period_feed = feed.filter(
+            f'{start:%Y%m%d}-{end:%Y%m%d}',
+            pub_date__gte=start,
+            pub_date__lt=end,
+        )
+        context['page_obj'] = paginator_add(period_feed, request)
+        surrogates.tag_posts(request, context['page_obj'])
+        context['period_start'] = start
+        if day is not None:
+            context['period_format'] = 'd E Y'
+        elif month is not None:
+            context['period_format'] = 'F Y'
+        else:
+            context['period_format'] = 'Y'
+    return render(request, 'posts/date_archive.html', context)
+
+
+def index_archive(request, year=None, month=None, day=None):
+    context = {'title': 'Архив записей'}
+    surrogate.add_keys(request, surrogates.INDEX_KEY)
+    return render_date_archive(
+        request, index_feed(), 'posts:index_archive', {}, context,
+        year, month, day,
+    )
+
+
+def group_archive(request, slug, year=None, month=None, day=None):
+    group = get_group_or_404(slug)
+    context = {'title': f'Архив группы {group.title}', 'group': group}
+    surrogate.add_keys(request, surrogates.group_slug_key(group.slug))
+    return render_date_archive(
+        request, group_feed(group), 'posts:group_archive', {'slug': slug},
+        context, year, month, day,
+    )
+
+
+def profile_archive(request, username, year=None, month=None, day=None):
+    author = get_author_or_404(username)
+    surrogate.add_keys(request, surrogates.author_key(author.pk))
+    context = {
+        'title': f'Архив пользователя {author.get_full_name()}',
+        'author': author,
+    }
+    return render_date_archive(
+        request, author_feed(author), 'posts:profile_archive',
+        {'username': author.username}, context, year, month, day,
+    )
+
+
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = archive.get_post_or_404(post_id)
+    surrogates.tag_posts(request, [post])
     form = CommentForm(request.POST or None)
     comments = post.comments.all()
     context = {
         'post': post,
         'form': form,
         'comments': comments,
+        'archived': isinstance(post, ArchivedPost),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
 @login_required
+@throttle('post')
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -99,6 +237,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@throttle('comment')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -107,23 +246,36 @@ def add_comment(request, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
+        trending.record_comment(post.pk)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user).all()
+    # Версия меняется с каждым новым постом авторов из подписки, и
+    # закешированный фрагмент ленты со старой версией не показывается.
+    feed_version = unread.reset(request.user.pk)
+    post_list = archive.ChainedFeed(
+        cards(Post.objects.filter(author__following__user=request.user)),
+        cards(ArchivedPost.objects.filter(
+            author__following__user=request.user
+        )),
+        f'follow:{request.user.pk}',
+    )
     page_obj = paginator_add(post_list, request)
     context = {
         'page_obj': page_obj,
+        'feed_version': feed_version,
+        'suggestions': suggestions.suggestions_for(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@throttle('follow', methods=('GET', 'POST'))
 def profile_follow(request, username):
     # Подписаться на автора
-    author = get_object_or_404(User, username=username)
+    author = get_author_or_404(username)
     user = request.user
     if author != user:
         Follow.objects.get_or_create(user=user, author=author)
@@ -133,6 +285,33 @@ def profile_follow(request, username):
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_author_or_404(username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+def sitemap_index(request):
+    parts = sitemaps.render_index(request.build_absolute_uri)
+    return StreamingHttpResponse(parts, content_type=SITEMAP_CONTENT_TYPE)
+
+
+def sitemap_chunk(request, section, chunk):
+    if section not in sitemaps.SECTIONS:
+        raise Http404('Раздел карты сайта не найден.')
+    count = sitemaps.chunk_count(section)
+    if chunk >= count:
+        raise Http404('Часть карты сайта не найдена.')
+    parts = sitemaps.render_chunk(section, chunk, request.build_absolute_uri)
+    if chunk == count - 1:
+        # В последнюю часть попадают новые объекты, её не кешируем.
+        return StreamingHttpResponse(
+            parts, content_type=SITEMAP_CONTENT_TYPE
+        )
+    key = sitemaps.chunk_key(request.get_host(), section, chunk)
+    content = cache.get(key)
+    if content is not None:
+        return HttpResponse(content, content_type=SITEMAP_CONTENT_TYPE)
+    return StreamingHttpResponse(
+        sitemaps.cache_stream(parts, key),
+        content_type=SITEMAP_CONTENT_TYPE,
+    )
@@ -1,3 +1,15 @@
-# from django.contrib import admin
+from core.admin import QueuedDeletionMixin
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from posts import deletion
 
-# Register your models here.
+User = get_user_model()
+
+
+class UserAdmin(QueuedDeletionMixin, BaseUserAdmin):
+    enqueue = staticmethod(deletion.enqueue)
+
+
+admin.site.unregister(User)
+admin.site.register(User, UserAdmin)
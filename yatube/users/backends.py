@@ -0,0 +1,47 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .cache import SESSION_USER_FIELDS, USER_CACHE_TIMEOUT, User, user_id_key
+
+
+def session_user(values, session_hash):
+    """Пользователь сессии из кеша: остальные поля, в том числе пароль,
+    отложены и подгрузятся из БД при первом обращении к ним."""
+    user = User.from_db(None, SESSION_USER_FIELDS, values)
+
+    def get_session_auth_hash():
+        # get_user() из django.contrib.auth сверяет этот хеш с хешем
+        # в сессии; читать ради него пароль из БД не нужно. Если пароль
+        # уже загружен или изменён set_password(), хеш считается по нему:
+        # так update_session_auth_hash() сохранит в сессии новый хеш.
+        if 'password' in user.__dict__:
+            return User.get_session_auth_hash(user)
+        return session_hash
+
+    user.get_session_auth_hash = get_session_auth_hash
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который загружает пользователя сессии из кеша.
+
+    AuthenticationMiddleware вызывает get_user() на каждом запросе.
+    Запись в кеше удаляется при любом сохранении или удалении
+    пользователя, в том числе при смене пароля.
+    """
+
+    def get_user(self, user_id):
+        key = user_id_key(user_id)
+        cached = cache.get(key)
+        if cached is not None:
+            user = session_user(*cached)
+        else:
+            user = User._default_manager.filter(pk=user_id).first()
+            if user is None:
+                return None
+            values = [getattr(user, field) for field in SESSION_USER_FIELDS]
+            cache.set(
+                key, (values, user.get_session_auth_hash()),
+                USER_CACHE_TIMEOUT,
+            )
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+
+User = get_user_model()
+
+# Поля пользователя, которых достаточно для страниц профиля.
+USER_CACHE_FIELDS = ('id', 'username', 'first_name', 'last_name')
+USER_CACHE_TIMEOUT = 60 * 60 * 24
+# Поля пользователя сессии, которые хранятся в кеше. Хеша пароля и почты
+# среди них нет: для проверки сессии хранится производный хеш сессии.
+# Порядок — как у полей модели: этого требует Model.from_db().
+SESSION_USER_FIELDS = (
+    'id', 'last_login', 'is_superuser', 'username', 'first_name',
+    'last_name', 'is_staff', 'is_active', 'date_joined',
+)
+# Неизвестные имена кешируем ненадолго: этого хватает против потока 404.
+USER_MISSING_TIMEOUT = 60
+USER_MISSING = 'missing'
+
+
+def username_key(username):
+    return f'users:username:{username}'
+
+
+def cache_user(user):
+    """Сохраняет отображаемые поля пользователя в кеше."""
+    values = [getattr(user, field) for field in USER_CACHE_FIELDS]
+    cache.set(username_key(user.username), values, USER_CACHE_TIMEOUT)
+
+
+def forget_username(username):
+    cache.delete(username_key(username))
+
+
+def get_author_or_404(username):
+    """Возвращает пользователя по username, обращаясь к БД только
+    при промахе кеша.
+
+    Пользователь из кеша загружен частично: остальные поля отложены
+    и подгрузятся из БД при первом обращении к ним.
+    """
+    key = username_key(username)
+    values = cache.get(key)
+    if values is None:
+        values = User.objects.filter(username=username).values_list(
+            *USER_CACHE_FIELDS
+        ).first()
+        if values is None:
+            cache.set(key, USER_MISSING, USER_MISSING_TIMEOUT)
+            raise Http404('Пользователь не найден.')
+        cache.set(key, list(values), USER_CACHE_TIMEOUT)
+    elif values == USER_MISSING:
+        raise Http404('Пользователь не найден.')
+    return User.from_db(None, USER_CACHE_FIELDS, values)
+
+
+def user_id_key(user_id):
+    return f'users:id:{user_id}'
+
+
+def forget_user_id(user_id):
+    cache.delete(user_id_key(user_id))
@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import User, cache_user, forget_user_id, forget_username
+
+# Кеш меняется только после фиксации транзакции: иначе другой процесс
+# успеет закешировать старые строки, а откат оставит в кеше то, чего
+# в БД нет.
+
+
+@receiver(pre_save, sender=User)
+def forget_renamed_user(sender, instance, update_fields=None, **kwargs):
+    """При переименовании убирает из кеша старое имя пользователя."""
+    if instance.pk is None:
+        return
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    old_username = User.objects.filter(pk=instance.pk).values_list(
+        'username', flat=True
+    ).first()
+    if old_username is not None and old_username != instance.username:
+        transaction.on_commit(lambda: forget_username(old_username))
+
+
+@receiver(post_save, sender=User)
+def refresh_cached_user(sender, instance, **kwargs):
+    def refresh():
+        cache_user(instance)
+        forget_user_id(instance.pk)
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    username, user_id = instance.username, instance.pk
+
+    def forget():
+        forget_username(username)
+        forget_user_id(user_id)
+
+    transaction.on_commit(forget)
@@ -1,3 +1,101 @@
-# from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from users.cache import user_id_key, username_key
+
+User = get_user_model()
+
+
+class CachedSessionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='session_user', password='old-password-123'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.login(
+            username='session_user', password='old-password-123'
+        )
+
+    def test_session_and_user_come_from_cache(self):
+        """Сессия и пользователь не запрашиваются из БД повторно."""
+        url = reverse('about:author')
+        self.authorized_client.get(url)
+        with self.assertNumQueries(0):
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.context['user'], CachedSessionTest.user)
+
+    def test_password_hash_is_not_cached(self):
+        """В кеше нет ни хеша пароля, ни почты пользователя."""
+        user = CachedSessionTest.user
+        User.objects.filter(pk=user.pk).update(email='secret@example.com')
+        self.authorized_client.get(reverse('about:author'))
+        cached = repr(cache.get(user_id_key(user.pk)))
+        self.assertNotIn(user.password, cached)
+        self.assertNotIn('secret@example.com', cached)
+
+    def test_password_change_invalidates_cached_user(self):
+        """После смены пароля старая сессия перестаёт действовать."""
+        url = reverse('about:author')
+        self.authorized_client.get(url)
+        user = User.objects.get(pk=CachedSessionTest.user.pk)
+        user.set_password('new-password-456')
+        with mock.patch(
+            'users.signals.transaction.on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            user.save()
+        response = self.authorized_client.get(url)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_own_password_change_keeps_session(self):
+        """Смена пароля через форму не завершает сессию пользователя."""
+        url = reverse('about:author')
+        self.authorized_client.get(url)
+        with mock.patch(
+            'users.signals.transaction.on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            response = self.authorized_client.post(
+                reverse('users:password_change'), {
+                    'old_password': 'old-password-123',
+                    'new_password1': 'new-password-456',
+                    'new_password2': 'new-password-456',
+                }
+            )
+        self.assertEqual(response.status_code, 302)
+        response = self.authorized_client.get(url)
+        self.assertTrue(response.context['user'].is_authenticated)
+        self.assertTrue(Client().login(
+            username='session_user', password='new-password-456'
+        ))
+
+    def test_logout_ends_cached_session(self):
+        """Выход удаляет сессию из кеша."""
+        self.authorized_client.get(reverse('users:logout'))
+        response = self.authorized_client.get(reverse('about:author'))
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_rolled_back_rename_is_not_cached(self):
+        """Переименование, которое откатилось, не попадает в кеш."""
+        user = CachedSessionTest.user
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                user.username = 'never_committed'
+                user.save()
+                raise RuntimeError
+        user.refresh_from_db()
+        self.assertIsNone(cache.get(username_key('never_committed')))
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'never_committed'})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -10,11 +10,25 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Тесты (manage.py test и pytest) держат файлы кеша во временном
+# каталоге, который удаляется после прогона: данные тестов не попадают
+# в кеш сервера разработки, а cache.clear() в тестах его не стирает.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    DATA_DIR = tempfile.mkdtemp(prefix='yatube-test-')
+    atexit.register(shutil.rmtree, DATA_DIR, ignore_errors=True)
+else:
+    DATA_DIR = BASE_DIR
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -51,11 +65,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.CompressionMiddleware',
+    # Выше SessionMiddleware, CsrfViewMiddleware и MessageMiddleware:
+    # видит cookie, которые они ставят ответу.
+    'core.surrogate.SurrogateKeyMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'posts.middleware.PrerenderMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -75,6 +95,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'posts.context_processors.unread_posts',
             ],
         },
     },
@@ -94,6 +115,13 @@ DATABASES = {
 }
 
 
+# Сессии читаются из кеша с записью в БД, пользователь сессии
+# загружается из кеша бэкендом аутентификации.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -134,11 +162,27 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
+# collectstatic собирает сюда статику с хешами в именах и сжатыми
+# копиями, StaticFilesMiddleware отдаёт её с вечным кешированием.
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма складываются в очередь и отправляются командой send_outbox
+# через OUTBOX_EMAIL_BACKEND.
+EMAIL_BACKEND = 'core.mail.OutboxEmailBackend'
+OUTBOX_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 8
+# Задержка после первой ошибки в секундах, дальше она удваивается.
+OUTBOX_RETRY_DELAY = 60
+# На сколько секунд воркер забирает пачку писем себе.
+OUTBOX_LEASE = 300
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # Static files (CSS, JavaScript, Images)
@@ -147,10 +191,127 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Отдачу медиафайлов можно передать прокси-серверу: 'x-accel-redirect'
+# (nginx, файлы доступны по internal-адресу MEDIA_ACCEL_PREFIX)
+# или 'x-sendfile' (Apache, lighttpd). None — отдаёт само приложение.
+MEDIA_OFFLOAD = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Загруженные картинки не перезаписываются, но могут быть удалены.
+MEDIA_MAX_AGE = 60 * 60 * 24
+
+# Миниатюры sorl-thumbnail лежат в MEDIA_ROOT/cache/.
+THUMBNAIL_PREFIX = 'cache/'
+THUMBNAIL_BACKEND = 'posts.images.ThumbnailBackend'
+THUMBNAIL_KVSTORE = 'core.kvstore.KVStore'
+THUMBNAIL_KVSTORE_FILE = os.path.join(DATA_DIR, 'thumbnails.sqlite3')
+# Записи о миниатюрах в памяти процесса: не больше LRU_SIZE штук и не
+# дольше LRU_TIMEOUT секунд, после чего перечитываются из файла.
+THUMBNAIL_KVSTORE_LRU_SIZE = 10000
+THUMBNAIL_KVSTORE_LRU_TIMEOUT = 60
+
+# Картинки постов: ширины миниатюр, пропорции и современные форматы,
+# которые отдаются браузеру, если их поддерживает установленный Pillow.
+POST_IMAGE_WIDTHS = (480, 960)
+POST_IMAGE_RATIO = (960, 339)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP')
+POST_IMAGE_SIZES = '(max-width: 576px) 100vw, 960px'
+
+# Двухуровневый кеш: LRU в памяти процесса и общий для процессов
+# SQLite-файл. Изменения из других процессов видны через SYNC_INTERVAL.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TwoLevelCache',
+        'LOCATION': os.path.join(DATA_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'L1_MAX_ENTRIES': 1000,
+            'SYNC_INTERVAL': 0.2,
+        },
     }
 }
 
+# Кешированные фрагменты после устаревания ещё SWR_STALE_TIMEOUT секунд
+# отдаются как есть, пока их пересчитывает один запрос. SWR_BETA задаёт
+# склонность к досрочному пересчёту: 0 — только после устаревания.
+SWR_STALE_TIMEOUT = 60
+SWR_BETA = 1.0
+SWR_LOCK_TIMEOUT = 10
+SWR_LOCK_WAIT = 2
+
+# Заранее отрисованные страницы для анонимных посетителей (команда
+# prerender): PRERENDER_PAGES отрисовываются всегда, ещё
+# PRERENDER_HOT_PAGES выбираются по числу обращений; обращения старше
+# PRERENDER_HITS_TIMEOUT секунд весят вдвое меньше, а процессы сбрасывают
+# их в кеш раз в PRERENDER_HITS_FLUSH_INTERVAL секунд. Без изменений
+# страница перерисовывается раз в PRERENDER_MAX_AGE секунд.
+PRERENDER_PAGES = ['/']
+PRERENDER_HOT_PAGES = 20
+PRERENDER_HITS_TIMEOUT = 60 * 60 * 24
+PRERENDER_HITS_FLUSH_INTERVAL = 5
+PRERENDER_MAX_AGE = 60
+PRERENDER_TIMEOUT = 60 * 5
+PRERENDER_INTERVAL = 1
+PRERENDER_HOST = 'localhost'
+
+# Популярные посты: рейтинг по комментариям уменьшается вдвое за
+# TRENDING_HALF_LIFE секунд, команда decay_trending запускается раз
+# в TRENDING_DECAY_INTERVAL секунд.
+TRENDING_SIZE = 20
+TRENDING_HALF_LIFE = 60 * 60 * 6
+TRENDING_DECAY_INTERVAL = 60 * 10
+TRENDING_MIN_SCORE = 0.01
+
+# Сколько строк команда process_deletions удаляет в одной транзакции
+# при удалении пользователя или группы из очереди.
+DELETION_BATCH_SIZE = 500
+
+# Сколько авторов рекомендовать в блоке «На кого подписаться»; список
+# пересчитывает команда rebuild_suggestions.
+FOLLOW_SUGGESTIONS_SIZE = 5
+
+# Команда archive_posts переносит посты старше POST_ARCHIVE_AFTER_DAYS
+# в архивные таблицы транзакциями по POST_ARCHIVE_BATCH_SIZE постов.
+POST_ARCHIVE_AFTER_DAYS = 365
+POST_ARCHIVE_BATCH_SIZE = 500
+
+# Карта сайта делится на части по SITEMAP_CHUNK_SIZE id (не больше
+# 50 000 адресов, как требует протокол). Все части, кроме последней,
+# кешируются на SITEMAP_CACHE_TIMEOUT секунд.
+SITEMAP_CHUNK_SIZE = 50000
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сжатие ответов: типы содержимого, минимальный размер и время
+# хранения сжатых ответов, одинаковых для всех посетителей.
+COMPRESSION_TYPES = (
+    'text/',
+    'application/json',
+    'application/xml',
+    'application/javascript',
+    'image/svg+xml',
+)
+COMPRESSION_MIN_LENGTH = 200
+COMPRESSION_CACHE_TIMEOUT = 60 * 10
+HTML_MINIFY = True
+
+# Кеширующий прокси: помеченные ответы анонимным посетителям он хранит
+# SURROGATE_MAX_AGE секунд, а после изменений сбрасывает их по ключам.
+# Для настоящего прокси — 'core.surrogate.HTTPPurger' и адрес сброса.
+SURROGATE_MAX_AGE = 60
+SURROGATE_PURGER = 'core.surrogate.LocalPurger'
+SURROGATE_PURGE_URL = 'http://127.0.0.1:6081/'
+SURROGATE_PURGE_METHOD = 'PURGE'
+SURROGATE_PURGE_HEADER = 'Surrogate-Key'
+SURROGATE_PURGE_TIMEOUT = 2
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Ограничение частоты записей: '<число>/<s|m|h|d>' на пользователя,
+# для анонимных запросов — на IP-адрес из THROTTLE_IP_HEADER. Число
+# больше нуля, частоты проверяются при запуске.
+THROTTLE_RATES = {
+    'post': '10/m',
+    'comment': '20/m',
+    'follow': '30/m',
+    'signup': '5/m',
+}
+THROTTLE_IP_HEADER = 'REMOTE_ADDR'